@@ -0,0 +1,224 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from scheduler import BackendScheduler, Overloaded, current_session
+from tracing import tracer
+from collections import OrderedDict
+import threading
+import logging
+import json
+import time
+import re
+
+SESSION_PATH = re.compile(r"^/sessions/([\w.-]+)(/query)?$")
+
+class ScheduledModel:
+    """Wraps a LangChain chat model so that every invoke waits for a slot of the backend scheduler."""
+    def __init__(self, model, scheduler):
+        self.model = model
+        self.scheduler = scheduler
+
+    def bind_tools(self, tools):
+        return ScheduledModel(self.model.bind_tools(tools), self.scheduler)
+
+    def invoke(self, messages):
+        return self.scheduler.run(self.model.invoke, messages)
+
+class Session:
+    def __init__(self, agent):
+        self.agent = agent
+        self.lock = threading.Lock()
+        self.queries = 0
+
+class AgentServer:
+    """
+    Hosts many research sessions in one process, keyed by session (thread) id.
+    `variant="scratch"` keeps one from-scratch Agent per session (the least recently used are dropped
+    past `max_sessions`), `variant="langgraph"` shares one graph whose SQLiteCheckpointStore keeps each
+    thread on disk at `checkpoint_path`.
+    Every model request goes through the shared BackendScheduler. `keep_alive` and `options`
+    (e.g. {"num_ctx": 16384}) are passed through to Ollama.
+    """
+    def __init__(self, variant="scratch", model="qwen3:30b", max_sessions=256, scheduler=None,
+                 checkpoint_path="../cache/checkpoints.sqlite", keep_alive="30m", options=None):
+        self.variant = variant
+        self.keep_alive = keep_alive
+        self.options = options or {}
+        self.checkpoint_path = checkpoint_path
+        self.model = model
+        self.max_sessions = max_sessions
+        self.scheduler = scheduler or BackendScheduler()
+        self.sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.graph_agent = self._build_graph_agent() if variant == "langgraph" else None
+
+    def _build_graph_agent(self):
+        from checkpoint_store import SQLiteCheckpointStore
+        from langchain_ollama import ChatOllama
+        import react_agent_langgraph as graph_agent
+        model = ScheduledModel(ChatOllama(model=self.model, temperature=0.5, keep_alive=self.keep_alive, **self.options), self.scheduler)
+        return graph_agent.Agent(model=model, tools=graph_agent.tools, system=graph_agent.system, checkpointer=SQLiteCheckpointStore(self.checkpoint_path))
+
+    def _build_scratch_agent(self, session_id):
+        import react_agent_from_scratch as scratch
+        scheduler = self.scheduler
+
+        class ScheduledAgent(scratch.Agent):
+            def complete(self):
+                return scheduler.run(super().complete, session=session_id)
+
+        return ScheduledAgent(self.model, scratch.system, scratch.tools, keep_alive=self.keep_alive, options=self.options)
+
+    def session(self, session_id) -> Session:
+        with self._lock:
+            if session_id in self.sessions:
+                self.sessions.move_to_end(session_id)
+                return self.sessions[session_id]
+            agent = self.graph_agent if self.graph_agent else self._build_scratch_agent(session_id)
+            session = self.sessions[session_id] = Session(agent)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+            return session
+
+    def query(self, session_id, question) -> dict:
+        session = self.session(session_id)
+        started = time.perf_counter()
+        # One question at a time per session, other sessions run concurrently.
+        with session.lock:
+            token = current_session.set(session_id)
+            snapshot = None if self.graph_agent else session.agent.memory.snapshot()
+            try:
+                if self.graph_agent:
+                    answer = self._graph_query(session_id, question)
+                else:
+                    answer = session.agent.query(question)
+            except Overloaded:
+                # The client is told to retry the question, so this attempt must leave no trace in the session.
+                if self.graph_agent:
+                    self._graph_rollback(session_id)
+                else:
+                    session.agent.memory.restore(snapshot)
+                raise
+            finally:
+                current_session.reset(token)
+            session.queries += 1
+        return {"session": session_id, "answer": answer, "elapsed": time.perf_counter() - started}
+
+    def _graph_query(self, session_id, question):
+        from langchain_core.messages import HumanMessage
+        config = {"configurable": {"thread_id": session_id}}
+        state = self.graph_agent.graph.invoke({"messages": [HumanMessage(question)]}, config)
+        return state["messages"][-1].content
+
+    def _graph_rollback(self, session_id):
+        """Makes the checkpoint the last query started from the latest one again."""
+        config = {"configurable": {"thread_id": session_id}}
+        for snapshot in self.graph_agent.graph.get_state_history(config):
+            if snapshot.metadata.get("source") != "input":
+                continue
+            if snapshot.parent_config is None:
+                self.graph_agent.graph.checkpointer.delete_thread(session_id)
+            else:
+                # A fork of the previous final state, appending no message: the next question starts from it.
+                self.graph_agent.graph.update_state(snapshot.parent_config, {"messages": []}, as_node="llm")
+            return
+
+    def sources(self, session_id) -> list:
+        """URLs of the pages the session's agent read, during its last query for the from-scratch agent."""
+        if self.graph_agent:
+            # The checkpoint keeps every message of the thread, nothing is folded away.
+            state = self.graph_agent.graph.get_state({"configurable": {"thread_id": session_id}})
+            urls = []
+            for message in state.values.get("messages", []):
+                for call in getattr(message, "tool_calls", None) or []:
+                    if call["name"] == "parse_tool":
+                        read = call["args"].get("urls") or []
+                        urls.extend([read] if isinstance(read, str) else read)
+            return list(dict.fromkeys(urls))
+        with self._lock:
+            session = self.sessions.get(session_id)
+        return list(session.agent.sources) if session else []
+
+    def drop(self, session_id) -> bool:
+        if self.graph_agent:
+            self.graph_agent.graph.checkpointer.delete_thread(session_id)
+        with self._lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            sessions = len(self.sessions)
+        stats = {"variant": self.variant, "sessions": sessions, **self.scheduler.stats()}
+        if self.graph_agent:
+            stats.update({f"checkpoint_{key}": value for key, value in self.graph_agent.graph.checkpointer.stats.items()})
+        return stats
+
+    def prometheus(self) -> str:
+        lines = [f"agent_server_{key} {value}" for key, value in self.stats().items() if isinstance(value, (int, float))]
+        return "\n".join(lines) + "\n" + tracer.prometheus()
+
+class AgentRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /sessions/<id>/query {"question": ...} -> {"session", "answer", "elapsed"}
+    DELETE /sessions/<id>, GET /stats (JSON), GET /metrics (Prometheus text).
+    Answers 429 when the backend queue is full.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        match = SESSION_PATH.match(self.path)
+        if not match or not match.group(2):
+            return self.send_json({"error": "not found"}, 404)
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            question = body["question"]
+        except (ValueError, KeyError):
+            return self.send_json({"error": "expected a JSON body with a 'question'"}, 400)
+        try:
+            return self.send_json(self.server.agents.query(match.group(1), question))
+        except Overloaded as e:
+            return self.send_json({"error": str(e)}, 429, headers={"Retry-After": "1"})
+        except Exception as e:
+            logging.exception(f"Query of session {match.group(1)} failed.")
+            return self.send_json({"error": repr(e)}, 500)
+
+    def do_DELETE(self):
+        match = SESSION_PATH.match(self.path)
+        if not match or match.group(2):
+            return self.send_json({"error": "not found"}, 404)
+        return self.send_json({"dropped": self.server.agents.drop(match.group(1))})
+
+    def do_GET(self):
+        if self.path == "/stats":
+            return self.send_json(self.server.agents.stats())
+        if self.path == "/metrics":
+            return self.send_body(self.server.agents.prometheus().encode(), "text/plain; version=0.0.4")
+        return self.send_json({"error": "not found"}, 404)
+
+    def send_json(self, payload, status=200, headers=None):
+        self.send_body(json.dumps(payload, ensure_ascii=False).encode(), "application/json", status, headers)
+
+    def send_body(self, body, content_type, status=200, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve(agents: AgentServer, host="127.0.0.1", port=8080):
+    server = ThreadingHTTPServer((host, port), AgentRequestHandler)
+    server.daemon_threads = True
+    server.agents = agents
+    return server
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    server = serve(AgentServer(variant="scratch"))
+    logging.info(f"Serving research sessions on http://{server.server_address[0]}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from agent_server import AgentServer
+from scheduler import BackendScheduler
+from tracing import tracer
+import contextvars
+import argparse
+import hashlib
+import logging
+import json
+import time
+import os
+import re
+
+URL_RE = re.compile(r"https?://[^\s<>\"'\])]+")
+
+def read_queries(path) -> list:
+    """
+    Reads {"id", "question"} lines, a line may also be a bare JSON string. Missing ids are derived from the
+    question, a question asked again gets its id with "-2", "-3"... appended.
+    """
+    queries = []
+    derived = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if isinstance(row, str):
+                row = {"question": row}
+            if "id" not in row:
+                key = hashlib.sha1(row["question"].encode()).hexdigest()[:12]
+                derived[key] = derived.get(key, 0) + 1
+                row["id"] = key if derived[key] == 1 else f"{key}-{derived[key]}"
+            queries.append(row)
+    return queries
+
+def read_done(path) -> set:
+    """Ids already answered in `path`. Failed queries and a line cut short by a crash are run again."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    # Rows are written with ensure_ascii=False, a crash may cut a line in the middle of a character.
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if "answer" in row:
+                done.add(row["id"])
+    return done
+
+def end_last_line(path):
+    """Ends a line cut short by a crash, read_done skips it. Bytes, as the line may end inside a character."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        if not f.seek(0, os.SEEK_END):
+            return
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+def citations(sources, answer) -> list:
+    """Pages the agent read, then other URLs quoted in the answer."""
+    urls = list(sources) + [url.rstrip(".,;:") for url in URL_RE.findall(answer or "")]
+    return list(dict.fromkeys(urls))
+
+class BatchRunner:
+    """
+    Answers many questions with up to `parallelism` agents at once, appending one JSONL line per query
+    to `output_path` as soon as it finishes, so that a run restarted after a crash skips what is done.
+    The workers are threads of one process: the page cache, search cache, local index and fetcher of
+    web.py are shared between them. Model requests go through the AgentServer's BackendScheduler,
+    whose `max_in_flight` should match what the backend serves in parallel.
+    """
+    def __init__(self, agents: AgentServer, parallelism=4):
+        self.agents = agents
+        self.parallelism = parallelism
+
+    def run(self, queries: list, output_path) -> dict:
+        done = read_done(output_path)
+        pending = {}
+        for query in queries:
+            if query["id"] in pending:
+                # Both would run in the same session, and the first one done would drop it from under the other.
+                logging.warning(f"Query id {query['id']} is used more than once, only its first question is answered.")
+            elif query["id"] not in done:
+                pending[query["id"]] = query
+        pending = list(pending.values())
+        logging.info(f"{len(done)} queries already answered, {len(pending)} to run with parallelism {self.parallelism}.")
+        summary = {"skipped": len(queries) - len(pending), "answered": 0, "failed": 0}
+        started = time.perf_counter()
+        end_last_line(output_path)
+        with open(output_path, "a", encoding="utf-8") as output, ThreadPoolExecutor(self.parallelism, thread_name_prefix="batch") as executor:
+            futures = [executor.submit(contextvars.copy_context().run, self.answer, query) for query in pending]
+            for future in as_completed(futures):
+                row = future.result()
+                summary["answered" if "answer" in row else "failed"] += 1
+                output.write(json.dumps(row, ensure_ascii=False) + "\n")
+                output.flush()
+        summary["elapsed"] = time.perf_counter() - started
+        summary["queries_per_second"] = (summary["answered"] + summary["failed"]) / summary["elapsed"] if pending else 0.0
+        return summary
+
+    def answer(self, query) -> dict:
+        # Each query is its own session, dropped once answered so that memory stays flat.
+        session_id = f"batch-{query['id']}"
+        started = time.perf_counter()
+        row = {"id": query["id"], "question": query["question"]}
+        with tracer.span("batch_query", query=query["id"]) as span:
+            try:
+                result = self.agents.query(session_id, query["question"])
+                row["answer"] = result["answer"]
+                row["citations"] = citations(self.agents.sources(session_id), result["answer"])
+            except Exception as e:
+                logging.exception(f"Query {query['id']} failed.")
+                row["error"] = repr(e)
+                span.set(error=repr(e))
+            finally:
+                self.agents.drop(session_id)
+        row["elapsed"] = time.perf_counter() - started
+        row["finished_at"] = time.time()
+        return row
+
+def main():
+    parser = argparse.ArgumentParser(description="Answers the questions of a JSONL file, one JSONL line per answer.")
+    parser.add_argument("queries", help='JSONL file of {"id": ..., "question": ...}')
+    parser.add_argument("output", help="JSONL file the answers are appended to, queries already in it are skipped")
+    parser.add_argument("--parallelism", type=int, default=4, help="queries answered at once")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="model requests sent to the backend at once")
+    parser.add_argument("--variant", choices=("scratch", "langgraph"), default="scratch")
+    parser.add_argument("--model", default="qwen3:30b")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    scheduler = BackendScheduler(max_in_flight=args.max_in_flight, max_queue=max(64, args.parallelism))
+    agents = AgentServer(variant=args.variant, model=args.model, max_sessions=max(256, args.parallelism), scheduler=scheduler)
+    summary = BatchRunner(agents, parallelism=args.parallelism).run(read_queries(args.queries), args.output)
+    print(json.dumps(summary))
+
+if __name__ == "__main__":
+    main()
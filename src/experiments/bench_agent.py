@@ -0,0 +1,167 @@
+from observation import count_tokens
+from search_cache import normalize_query
+from local_server import serve
+from types import SimpleNamespace, ModuleType
+import tracemalloc
+import tempfile
+import json
+import time
+import sys
+import os
+import web
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SESSION_PATH = os.path.join(HERE, "fixtures", "recorded_session.json")
+# Simulated latencies, in seconds, of one model call and one search.
+MODEL_LATENCY = 0.05
+SEARCH_LATENCY = 0.02
+
+class Recorder:
+    """Collects one entry per model call, the tools run after that call are added to the same step."""
+    def __init__(self):
+        self.steps = []
+
+    def model_call(self, tokens_sent, model_time):
+        self.steps.append({"tokens_sent": tokens_sent, "model_time": model_time, "tool_time": 0.0})
+
+    def tool_call(self, tool_time):
+        self.steps[-1]["tool_time"] += tool_time
+
+class FakeDDGS:
+    def __init__(self, results):
+        self.results = results
+
+    def text(self, query, max_results=3):
+        time.sleep(SEARCH_LATENCY)
+        return self.results.get(normalize_query(query), [])[:max_results]
+
+def fill(value, server_url):
+    """Replaces the {server} placeholder of the recorded session by the stand-in server URL."""
+    if isinstance(value, str):
+        return value.replace("{server}", server_url)
+    if isinstance(value, list):
+        return [fill(item, server_url) for item in value]
+    if isinstance(value, dict):
+        return {fill(key, server_url): fill(item, server_url) for key, item in value.items()}
+    return value
+
+def fake_ollama(responses, recorder):
+    """Stand-in for the ollama module that replays recorded responses."""
+    module = ModuleType("ollama")
+
+    def chat(model, messages, stream=False, options=None, keep_alive=None):
+        started = time.perf_counter()
+        time.sleep(MODEL_LATENCY)
+        content = next(responses)
+        recorder.model_call(sum(count_tokens(message["content"]) for message in messages), time.perf_counter() - started)
+        return {"message": SimpleNamespace(role="assistant", content=content)}
+
+    module.chat = chat
+    module.list = lambda: {"models": [SimpleNamespace(model="qwen3:30b")]}
+    return module
+
+class FakeToolModel:
+    """Stand-in for ChatOllama(...).bind_tools(...) that replays recorded AIMessages."""
+    def __init__(self, responses, recorder):
+        self.responses = responses
+        self.recorder = recorder
+
+    def bind_tools(self, tools):
+        return self
+
+    def invoke(self, messages):
+        from langchain_core.messages import AIMessage
+        started = time.perf_counter()
+        time.sleep(MODEL_LATENCY)
+        response = next(self.responses)
+        tool_calls = [{**call, "id": f"call_{i}"} for i, call in enumerate(response["tool_calls"])]
+        self.recorder.model_call(sum(count_tokens(str(message.content)) for message in messages), time.perf_counter() - started)
+        return AIMessage(content=response["content"], tool_calls=tool_calls)
+
+def run_from_scratch(session, recorder):
+    sys.modules["ollama"] = fake_ollama(iter(session["from_scratch"]), recorder)
+    import react_agent_from_scratch as scratch
+
+    class TimedAgent(scratch.Agent):
+        def run_action(self, *args):
+            started = time.perf_counter()
+            observation = super().run_action(*args)
+            recorder.tool_call(time.perf_counter() - started)
+            return observation
+
+    scratch._local_models = (0.0, [])
+    agent = TimedAgent("qwen3:30b", scratch.system, scratch.tools)
+    return agent.query(session["question"])
+
+def run_langgraph(session, recorder):
+    from langgraph.checkpoint.memory import MemorySaver
+    from langchain_core.messages import HumanMessage
+    import react_agent_langgraph as graph_agent
+
+    class TimedAgent(graph_agent.Agent):
+        def take_action(self, state):
+            started = time.perf_counter()
+            result = super().take_action(state)
+            recorder.tool_call(time.perf_counter() - started)
+            return result
+
+    model = FakeToolModel(iter(session["langgraph"]), recorder)
+    agent = TimedAgent(model=model, tools=graph_agent.tools, system=graph_agent.system, checkpointer=MemorySaver())
+    config = {"configurable": {"thread_id": "bench"}}
+    for update in agent.graph.stream({"messages": [HumanMessage(session["question"])]}, config, stream_mode="updates"):
+        pass
+    return update["llm"]["messages"][-1].content
+
+def reset_web(cache_dir, search_results, prefetch=False):
+    web.PREFETCH = prefetch
+    web.PAGE_CACHE_PATH = os.path.join(cache_dir, "pages.sqlite")
+    if os.path.exists(web.PAGE_CACHE_PATH):
+        os.remove(web.PAGE_CACHE_PATH)
+    web.LOCAL_INDEX_PATH = os.path.join(cache_dir, "index.sqlite")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(web.LOCAL_INDEX_PATH + suffix):
+            os.remove(web.LOCAL_INDEX_PATH + suffix)
+    web.get_page_cache.cache_clear()
+    web.get_search_cache.cache_clear()
+    web.get_local_index.cache_clear()
+    web.get_prefetcher.cache_clear()
+    fake = FakeDDGS(search_results)
+    web.get_ddg = lambda: fake
+
+def report(name, recorder, wall_time, peak):
+    print(f"\n{name}")
+    print(f"    {'step':<6}{'tokens sent':>12}{'model':>10}{'tools':>10}")
+    for i, step in enumerate(recorder.steps):
+        print(f"    {i:<6}{step['tokens_sent']:>12}{step['model_time'] * 1000:>8.0f}ms{step['tool_time'] * 1000:>8.0f}ms")
+    model_time = sum(step["model_time"] for step in recorder.steps)
+    tool_time = sum(step["tool_time"] for step in recorder.steps)
+    print(
+        f"    total {wall_time * 1000:.0f}ms: model {model_time * 1000:.0f}ms, tools {tool_time * 1000:.0f}ms, "
+        f"agent overhead {(wall_time - model_time - tool_time) * 1000:.0f}ms, "
+        f"{sum(step['tokens_sent'] for step in recorder.steps)} tokens sent, peak memory {peak / 1e6:.1f} MB"
+    )
+
+if __name__ == "__main__":
+    # Import everything up front so that import time does not count as tool or agent time.
+    import react_agent_from_scratch, react_agent_langgraph, fetcher, extractor, page_cache, search_cache
+    server = serve()
+    with open(SESSION_PATH, encoding="utf-8") as f:
+        session = fill(json.load(f), server.url)
+    search_results = {normalize_query(query): results for query, results in session["search"].items()}
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for name, run in (("from scratch", run_from_scratch), ("langgraph", run_langgraph)):
+            for cache in ("cold caches", "warm caches", "cold caches, prefetching"):
+                if cache != "warm caches":
+                    reset_web(cache_dir, search_results, prefetch=cache.endswith("prefetching"))
+                recorder = Recorder()
+                tracemalloc.start()
+                started = time.perf_counter()
+                run(session, recorder)
+                wall_time = time.perf_counter() - started
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                report(f"{name} ({cache})", recorder, wall_time, peak)
+                if web.PREFETCH:
+                    print(f"    prefetch: {web.get_prefetcher().report()}")
+    server.shutdown()
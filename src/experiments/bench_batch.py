@@ -0,0 +1,96 @@
+from bench_agent import fill, reset_web
+from search_cache import normalize_query
+from local_server import serve
+from types import SimpleNamespace, ModuleType
+import threading
+import tempfile
+import json
+import time
+import sys
+import os
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SESSION_PATH = os.path.join(HERE, "fixtures", "recorded_session.json")
+QUERIES = 48
+# Simulated model backend: each request takes MODEL_LATENCY and at most BACKEND_SLOTS run at once.
+MODEL_LATENCY = 0.05
+BACKEND_SLOTS = 8
+
+def fake_ollama(responses):
+    """Stand-in for the ollama module, the response only depends on how many observations the conversation has."""
+    module = ModuleType("ollama")
+    slots = threading.Semaphore(BACKEND_SLOTS)
+
+    def chat(model, messages, stream=False, options=None, keep_alive=None, **kwargs):
+        with slots:
+            time.sleep(MODEL_LATENCY)
+        step = sum(message["content"].startswith("Observation:") for message in messages)
+        return {"message": SimpleNamespace(role="assistant", content=responses[min(step, len(responses) - 1)])}
+
+    module.chat = chat
+    module.list = lambda: {"models": [SimpleNamespace(model="qwen3:30b")]}
+    return module
+
+def write_queries(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({"id": f"q{i}", "question": f"C'est quoi la météo du jour à Angers ? ({i})"}, ensure_ascii=False) + "\n")
+
+def run(batch, agents, queries, output_path, parallelism):
+    return batch.BatchRunner(agents, parallelism=parallelism).run(queries, output_path)
+
+if __name__ == "__main__":
+    server = serve()
+    with open(SESSION_PATH, encoding="utf-8") as f:
+        session = fill(json.load(f), server.url)
+    search_results = {normalize_query(query): results for query, results in session["search"].items()}
+    sys.modules["ollama"] = fake_ollama(session["from_scratch"])
+    import react_agent_from_scratch as scratch
+    from agent_server import AgentServer
+    from scheduler import BackendScheduler
+    import batch
+    import web
+    scratch._local_models = (0.0, [])
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        queries_path = os.path.join(cache_dir, "queries.jsonl")
+        write_queries(queries_path, QUERIES)
+        queries = batch.read_queries(queries_path)
+
+        print(f"{QUERIES} queries, 4 model calls each of {MODEL_LATENCY * 1000:.0f}ms, backend serves {BACKEND_SLOTS} at once")
+        print(f"    {'parallelism':<12}{'elapsed':>10}{'queries/s':>12}{'speedup':>10}{'p50 query':>12}")
+        baseline = None
+        for parallelism in (1, 2, 4, 8, 16):
+            reset_web(cache_dir, search_results)
+            output_path = os.path.join(cache_dir, f"answers-{parallelism}.jsonl")
+            agents = AgentServer(variant="scratch", scheduler=BackendScheduler(max_in_flight=BACKEND_SLOTS))
+            summary = run(batch, agents, queries, output_path, parallelism)
+            rows = [json.loads(line) for line in open(output_path, encoding="utf-8")]
+            p50 = sorted(row["elapsed"] for row in rows)[len(rows) // 2]
+            baseline = baseline or summary["queries_per_second"]
+            print(
+                f"    {parallelism:<12}{summary['elapsed']:>9.2f}s{summary['queries_per_second']:>12.1f}"
+                f"{summary['queries_per_second'] / baseline:>9.1f}x{p50 * 1000:>10.0f}ms"
+            )
+        print(f"    shared caches of the last run: search {web.get_search_cache().stats}, pages {web.get_page_cache().stats}")
+        print(f"    first answer: {rows[0]['answer'][:80]}... citations {rows[0]['citations']}")
+
+        # Resume: a crash left 10 answers and half a line, cut inside the "é" of "météo", the rerun only answers the rest.
+        output_path = os.path.join(cache_dir, "answers-resumed.jsonl")
+        agents = AgentServer(variant="scratch", scheduler=BackendScheduler(max_in_flight=BACKEND_SLOTS))
+        run(batch, agents, queries[:10], output_path, 8)
+        line = json.dumps(queries[10], ensure_ascii=False).encode()
+        with open(output_path, "ab") as f:
+            f.write(line[:line.index("é".encode()) + 1])
+        summary = run(batch, agents, queries, output_path, 8)
+        ids = [json.loads(line)["id"] for line in open(output_path, encoding="utf-8", errors="replace") if line.strip().endswith("}")]
+        print(f"\nresumed after a crash: {summary['skipped']} skipped, {summary['answered']} answered, {len(set(ids))} distinct ids in the output")
+
+        # A question asked twice without an id is answered twice, each in its own session.
+        with open(queries_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps("C'est quoi la météo du jour à Angers ?", ensure_ascii=False) + "\n")
+            f.write(json.dumps("C'est quoi la météo du jour à Angers ?", ensure_ascii=False) + "\n")
+        output_path = os.path.join(cache_dir, "answers-repeated.jsonl")
+        summary = run(batch, agents, batch.read_queries(queries_path), output_path, 8)
+        print(f"repeated question: {summary['answered']} answered, {summary['failed']} failed")
+    server.shutdown()
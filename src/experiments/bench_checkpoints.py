@@ -0,0 +1,120 @@
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from checkpoint_store import SQLiteCheckpointStore
+from langchain.tools import tool
+import tempfile
+import time
+import gc
+import os
+
+# One research session: three questions, each answered after one search and one parse.
+QUESTIONS = ("What is the tallest mountain?", "How tall is it?", "Who climbed it first?")
+PAGES = [f"Page {i}. " + "Everest is the highest mountain above sea level. " * 400 for i in range(20)]
+
+@tool
+def search_tool(query: str, max_results: int = 3):
+    """A web search engine."""
+    return [(f"https://example.org/{i}", "Everest") for i in range(max_results)]
+
+@tool
+def parse_tool(urls: list[str]):
+    """A website parser."""
+    # Sessions read overlapping pages, as they would for popular questions.
+    return str({url: PAGES[int(url.rsplit('/', 1)[1]) % len(PAGES)] for url in urls})
+
+class ScriptedModel:
+    """Searches, parses the results, then answers, for every question."""
+    def __init__(self):
+        self.calls = 0
+
+    def bind_tools(self, tools):
+        return self
+
+    def invoke(self, messages):
+        step = self.calls % 3
+        self.calls += 1
+        if step == 0:
+            return AIMessage(content="", tool_calls=[{"name": "search_tool", "args": {"query": "everest"}, "id": f"s{self.calls}"}])
+        if step == 1:
+            urls = [f"https://example.org/{(self.calls + i) % 40}" for i in range(3)]
+            return AIMessage(content="", tool_calls=[{"name": "parse_tool", "args": {"urls": urls}, "id": f"p{self.calls}"}])
+        return AIMessage(content=f"Everest, 8849 m [https://example.org/{self.calls % 40}]")
+
+def rss() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+def run(checkpointer, sessions, report_every):
+    import react_agent_langgraph as graph_agent
+    agent = graph_agent.Agent(model=ScriptedModel(), tools=[search_tool, parse_tool], checkpointer=checkpointer, system="sys")
+    baseline = rss()
+    started = time.perf_counter()
+    for i in range(sessions):
+        config = {"configurable": {"thread_id": f"session-{i}"}}
+        for question in QUESTIONS:
+            agent.graph.invoke({"messages": [HumanMessage(question)]}, config)
+        if (i + 1) % report_every == 0:
+            gc.collect()
+            print(f"    {i + 1:>6} sessions  RSS +{(rss() - baseline) / 1e6:7.1f} MB  {(time.perf_counter() - started) / (i + 1) * 1000:6.1f} ms/session")
+    # Resuming a session only reads its latest checkpoint back.
+    started = time.perf_counter()
+    for i in range(0, sessions, max(1, sessions // 100)):
+        agent.graph.get_state({"configurable": {"thread_id": f"session-{i}"}})
+    resumes = len(range(0, sessions, max(1, sessions // 100)))
+    print(f"    resume: {(time.perf_counter() - started) / resumes * 1000:.2f} ms per session")
+
+def run_long(checkpointer, questions, report_every):
+    """One session that keeps going: a checkpoint should cost the new messages, not the whole history."""
+    import react_agent_langgraph as graph_agent
+    agent = graph_agent.Agent(model=ScriptedModel(), tools=[search_tool, parse_tool], checkpointer=checkpointer, system="sys")
+    config = {"configurable": {"thread_id": "long-session"}}
+    started = time.perf_counter()
+    for i in range(questions):
+        agent.graph.invoke({"messages": [HumanMessage(f"Question {i}")]}, config)
+        if (i + 1) % report_every == 0:
+            print(f"    {i + 1:>6} questions  {(time.perf_counter() - started) / report_every * 1000:6.1f} ms/question")
+            started = time.perf_counter()
+    return len(agent.graph.get_state(config).values["messages"])
+
+def run_fork(checkpointer) -> list:
+    """Two questions, a rollback of the second as AgentServer does it on Overloaded, then a third question."""
+    import react_agent_langgraph as graph_agent
+    agent = graph_agent.Agent(model=ScriptedModel(), tools=[search_tool, parse_tool], checkpointer=checkpointer, system="sys")
+    config = {"configurable": {"thread_id": "forked-session"}}
+    for question in QUESTIONS[:2]:
+        agent.graph.invoke({"messages": [HumanMessage(question)]}, config)
+    started = next(state for state in agent.graph.get_state_history(config) if state.metadata.get("source") == "input")
+    agent.graph.update_state(started.parent_config, {"messages": []}, as_node="llm")
+    agent.graph.invoke({"messages": [HumanMessage(QUESTIONS[2])]}, config)
+    return [(type(message).__name__, message.content[:40]) for message in agent.graph.get_state(config).values["messages"]]
+
+if __name__ == "__main__":
+    import react_agent_langgraph
+    sessions, report_every = 600, 200
+    # The store runs first, so that the memory freed by MemorySaver does not hide its own growth.
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "checkpoints.sqlite")
+        store = SQLiteCheckpointStore(path)
+        print("SQLiteCheckpointStore")
+        run(store, sessions, report_every)
+        print(f"    {store.size()}")
+        print(f"    {store.stats}")
+        # Closing the last connection folds the write-ahead log back into the database file.
+        store.close()
+        raw = sessions * len(QUESTIONS) * 3 * len(PAGES[0])
+        print(f"    on disk: {os.path.getsize(path) / 1e6:.1f} MB for ~{raw / 1e6:.0f} MB of tool output")
+    print("MemorySaver")
+    run(MemorySaver(), sessions, report_every)
+
+    with tempfile.TemporaryDirectory() as directory:
+        print("\nSQLiteCheckpointStore, one long session")
+        stored = run_long(SQLiteCheckpointStore(os.path.join(directory, "long.sqlite")), 200, 40)
+        print(f"    messages read back: {stored}, expected {200 * 6}")
+    # MemorySaver keeps a serialized copy of the whole history per checkpoint, past ~150 questions it runs out of memory.
+    print("MemorySaver, one long session")
+    run_long(MemorySaver(), 120, 40)
+
+    with tempfile.TemporaryDirectory() as directory:
+        forked = run_fork(SQLiteCheckpointStore(os.path.join(directory, "fork.sqlite")))
+    expected = run_fork(MemorySaver())
+    print(f"\nrollback and new question: {len(forked)} messages, same history as MemorySaver: {forked == expected}")
@@ -0,0 +1,44 @@
+from bs4 import BeautifulSoup
+from extractor import extract_html
+from web import extract_text
+import tracemalloc
+import glob
+import time
+import os
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pages")
+
+def soup_extract(html):
+    return extract_text(BeautifulSoup(html, parser="lxml", features="lxml"))
+
+def measure(func, html):
+    tracemalloc.start()
+    started = time.perf_counter()
+    text = func(html)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return text, elapsed, peak
+
+def large_page(size):
+    block = (
+        "<div class='post'><h2>Title</h2><p>Some <b>bold</b> and <a href='#'>linked</a> words "
+        "in a paragraph.</p><script>track('x');</script><aside>ad</aside></div>\n"
+    )
+    return "<html><body><nav>menu</nav>" + block * (size // len(block)) + "</body></html>"
+
+if __name__ == "__main__":
+    pages = {os.path.basename(path): open(path, encoding="utf-8").read() for path in sorted(glob.glob(f"{FIXTURES}/*.html"))}
+    mismatches = [name for name, html in pages.items() if soup_extract(html) != extract_html(html)]
+    print(f"fixtures: {len(pages) - len(mismatches)}/{len(pages)} identical to extract_text {mismatches or ''}")
+
+    print(f"{'page':<14}{'mode':<22}{'time':>9}{'peak memory':>14}")
+    for size in (1_000_000, 5_000_000):
+        html = large_page(size)
+        for mode, func in (
+            ("beautifulsoup", soup_extract),
+            ("streaming", extract_html),
+            ("streaming, 100k", lambda html: extract_html(html, max_chars=100_000)),
+        ):
+            text, elapsed, peak = measure(func, html)
+            print(f"{f'{size / 1e6:.0f} MB':<14}{mode:<22}{elapsed:8.3f}s{peak / 1e6:11.1f} MB")
@@ -0,0 +1,31 @@
+import requests
+from fetcher import Fetcher
+from local_server import serve
+import time
+
+def serial_fetch(urls):
+    pages = {}
+    for url in urls:
+        pages[url] = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'})
+    return pages
+
+def bench(name, func, urls):
+    started = time.perf_counter()
+    pages = func(urls)
+    elapsed = time.perf_counter() - started
+    size = sum(len(page.text) for page in pages.values())
+    print(f"{name:<20} {elapsed:7.2f}s  {len(pages):>2}/{len(urls)} pages  {size / 1e6:6.2f} MB")
+
+if __name__ == "__main__":
+    server = serve(host="0.0.0.0")
+    urls = (
+        [f"{server.host_url(i)}/fast/{i}" for i in range(8)]
+        + [f"{server.host_url(i)}/slow?delay={d}" for i, d in enumerate((1, 2, 3))]
+        + [f"{server.host_url(i)}/large?size={s}" for i, s in enumerate((3_000_000, 8_000_000))]
+    )
+    stalled = urls + [f"{server.host_url(9)}/stall?delay=30"]
+
+    bench("fetcher", Fetcher(timeout=5.0, deadline=6.0).fetch_all, urls)
+    bench("fetcher + stall", Fetcher(timeout=5.0, deadline=6.0).fetch_all, stalled)
+    bench("serial", serial_fetch, urls)
+    server.shutdown()
@@ -0,0 +1,68 @@
+from local_index import LocalIndex
+import itertools
+import tempfile
+import random
+import time
+import sys
+import os
+
+# Synthetic corpus: pages of a few hundred words drawn from a Zipf-like vocabulary, like web text.
+VOCABULARY_SIZE = 50_000
+PAGE_WORDS = 600
+
+def make_vocabulary(rng):
+    syllables = ["ka", "to", "ri", "mu", "sen", "lo", "vi", "da", "per", "qu", "an", "el", "os", "tri", "mon", "zu"]
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(1, 4))))
+    return sorted(words)
+
+def make_page(rng, vocabulary, weights):
+    words = rng.choices(vocabulary, cum_weights=weights, k=PAGE_WORDS)
+    lines = [" ".join(words[i:i + 15]) for i in range(0, len(words), 15)]
+    return "\n".join(lines)
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+if __name__ == "__main__":
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    rng = random.Random(0)
+    vocabulary = make_vocabulary(rng)
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = LocalIndex(os.path.join(directory, "index.sqlite"))
+        started = time.perf_counter()
+        for i in range(pages):
+            index.add(f"https://example.org/page/{i}", make_page(rng, vocabulary, weights))
+        elapsed = time.perf_counter() - started
+        print(f"indexed {pages} pages ({len(index)} chunks) in {elapsed:.1f}s, {pages / elapsed:.0f} pages/s")
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"index size: {size / 1e6:.0f} MB")
+
+        # Queries mix frequent and rare words, as questions do.
+        for name, lowest_rank in (("common words", 0), ("mixed words", 100), ("rare words", 5_000)):
+            latencies = []
+            for _ in range(200):
+                query = " ".join(rng.choice(vocabulary[lowest_rank:lowest_rank + 20_000]) for _ in range(rng.randint(2, 5)))
+                started = time.perf_counter()
+                index.search(query, k=5)
+                latencies.append(time.perf_counter() - started)
+            print(
+                f"query ({name}): p50 {percentile(latencies, 0.5) * 1000:.2f}ms, "
+                f"p95 {percentile(latencies, 0.95) * 1000:.2f}ms, max {max(latencies) * 1000:.2f}ms"
+            )
+
+        # Re-reading a page that changed a little only re-indexes the changed chunks.
+        url = "https://example.org/page/0"
+        page = make_page(random.Random(1), vocabulary, weights)
+        index.add(url, page)
+        lines = page.split("\n")
+        lines[12] = lines[12].replace(lines[12].split()[0], "updated", 1)
+        edited = "\n".join(lines)
+        started = time.perf_counter()
+        added, removed = index.add(url, edited)
+        print(f"incremental update: {added} chunks added, {removed} removed in {(time.perf_counter() - started) * 1000:.2f}ms")
+        index.close()
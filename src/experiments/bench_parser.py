@@ -0,0 +1,80 @@
+from react_parser import parse_step
+import json
+import time
+import ast
+import os
+import re
+
+TRANSCRIPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "transcripts.jsonl")
+
+def legacy_parse(message):
+    """The parser Agent.query used before react_parser: two regex scans and ast.literal_eval."""
+    answer = re.compile(r'Answer\s*:\s*([\s\S]*)').search(message)
+    if answer and answer.group(1):
+        return None, None, answer.group(1)
+    action = re.compile(r'Action\s*:\s*(\w+)\s*:\s*(.*)').search(message)
+    if action:
+        try:
+            return action.group(1), ast.literal_eval(action.group(2)), None
+        except Exception:
+            return None, None, None
+    return None, None, None
+
+def new_parse(message):
+    step = parse_step(message)
+    return step.action, step.args, step.answer
+
+def replace_args(response, action, args_text):
+    line = re.search(rf"Action\s*:\s*{action}\s*:\s*(.*)", response)
+    return response[:line.start(1)] + args_text + response[line.end(1):]
+
+# Each mutation returns (response, expected_args) for an Action transcript.
+MUTATIONS = {
+    "original": lambda r, a, args: (r, args),
+    "pause": lambda r, a, args: (r.rstrip() + "\nPAUSE\n", args),
+    "trailing text": lambda r, a, args: (replace_args(r, a, repr(args) + " then I will read the results."), args),
+    "json literals": lambda r, a, args: (replace_args(r, a, json.dumps({**args, "safe": True, "region": None}, ensure_ascii=False)), {**args, "safe": True, "region": None}),
+    "missing brace": lambda r, a, args: (replace_args(r, a, repr(args)[:-1]), args),
+    "missing brackets": lambda r, a, args: (replace_args(r, a, repr(args)[:-2]) if repr(args).endswith("]}") else replace_args(r, a, repr(args)[:-1]), args),
+    "multi-line": lambda r, a, args: (replace_args(r, a, "{\n" + ",\n".join(f"    {k!r}: {v!r}" for k, v in args.items()) + "\n}") + "\nPAUSE", args),
+    "missing colon": lambda r, a, args: (r.replace(f"{a}:", a, 1), args),
+}
+
+def load_cases():
+    cases = []
+    for line in open(TRANSCRIPTS, encoding="utf-8"):
+        row = json.loads(line)
+        if "answer" in row:
+            cases.append(("answer", row["response"], None, None, row["answer"]))
+            continue
+        for name, mutate in MUTATIONS.items():
+            response, args = mutate(row["response"], row["action"], row["args"])
+            cases.append((name, response, row["action"], args, None))
+    return cases
+
+def score(parse, cases, repeat=200):
+    by_mutation = {}
+    for name, response, action, args, answer in cases:
+        ok = parse(response) == (action, args, answer)
+        passed, total = by_mutation.get(name, (0, 0))
+        by_mutation[name] = (passed + ok, total + 1)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for case in cases:
+            parse(case[1])
+    per_call = (time.perf_counter() - started) / (repeat * len(cases))
+    return by_mutation, per_call
+
+if __name__ == "__main__":
+    cases = load_cases()
+    legacy, legacy_time = score(legacy_parse, cases)
+    new, new_time = score(new_parse, cases)
+
+    print(f"{'case':<18}{'legacy':>10}{'react_parser':>14}")
+    for name in legacy:
+        print(f"{name:<18}{'%d/%d' % legacy[name]:>10}{'%d/%d' % new[name]:>14}")
+    legacy_ok = sum(passed for passed, _ in legacy.values())
+    new_ok = sum(passed for passed, _ in new.values())
+    print(f"{'total':<18}{legacy_ok / len(cases):>10.0%}{new_ok / len(cases):>14.0%}")
+    print(f"LLM retries saved: {new_ok - legacy_ok} of {len(cases)} responses")
+    print(f"time per response: legacy {legacy_time * 1e6:.1f}us, react_parser {new_time * 1e6:.1f}us")
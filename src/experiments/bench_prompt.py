@@ -0,0 +1,96 @@
+from observation import count_tokens
+from types import SimpleNamespace, ModuleType
+from datetime import datetime
+import argparse
+import sys
+import os
+
+MODEL = "qwen3:30b"
+QUESTION = "Question : Compare the population and the area of Angers and Nantes."
+ASSISTANT = "Thought: I need more figures for step {turn}.\nAction: search_tool: {{'query': 'angers nantes figures {turn}'}}\n"
+OBSERVATION = "Observation: " + " ".join(f"fact{i} about the cities, population and area." for i in range(45))
+
+class PrefixCacheBackend:
+    """
+    Stand-in for Ollama with a single slot: the KV cache of the previous prompt is reused for the
+    longest common prefix, only the rest of the prompt is evaluated, at `seconds_per_token`.
+    """
+    def __init__(self, seconds_per_token=0.0005):
+        self.seconds_per_token = seconds_per_token
+        self.cached = ""
+
+    def module(self):
+        module = ModuleType("ollama")
+        module.chat = self.chat
+        module.list = lambda: {"models": [SimpleNamespace(model=MODEL)]}
+        return module
+
+    def chat(self, model, messages, stream=False, options=None, keep_alive=None):
+        prompt = "".join(f"<{message['role']}>{message['content']}" for message in messages)
+        common = len(os.path.commonprefix([self.cached, prompt]))
+        self.cached = prompt
+        evaluated = count_tokens(prompt[common:])
+        return {
+            "message": SimpleNamespace(role="assistant", content="Thought: ..."),
+            "prompt_eval_count": evaluated,
+            "prompt_eval_duration": int(evaluated * self.seconds_per_token * 1e9),
+        }
+
+def run_session(scratch, system, compact_to, turns, context_budget, options):
+    agent = scratch.Agent(MODEL, system, {}, context_budget=context_budget, keep_alive="30m", options=options)
+    if compact_to is not None:
+        agent.memory.compact_to = compact_to
+    agent.add_message({"role": "user", "content": QUESTION})
+    evaluated = []
+    for turn in range(turns):
+        agent.chat()
+        evaluated.append((agent.usage.get("prompt_eval_count", 0), agent.usage.get("prompt_eval_duration", 0) / 1e9))
+        # Scripted turns, so that both layouts see the same conversation whatever the model answers.
+        agent.add_message({"role": "assistant", "content": ASSISTANT.format(turn=turn)})
+        agent.add_message({"role": "assistant", "content": OBSERVATION})
+    return evaluated
+
+def run(scratch, layout, sessions, turns, context_budget, options):
+    results = []
+    for _ in range(sessions):
+        if layout == "before":
+            # One CLI run per question: the prompt embedded datetime.now() and the history was trimmed
+            # one message at a time once over budget.
+            system = scratch.system.render(datetime.now())
+            results.append(run_session(scratch, system, 1.0, turns, context_budget, options))
+        else:
+            results.append(run_session(scratch, scratch.system, None, turns, context_budget, options))
+    return results
+
+def report(layout, results):
+    print(f"\n{layout}")
+    print(f"    {'turn':<6}" + "".join(f"{'session ' + str(i):>20}" for i in range(len(results))))
+    for turn in range(len(results[0])):
+        print(f"    {turn:<6}" + "".join(f"{session[turn][0]:>9} tok {session[turn][1] * 1000:>6.0f}ms" for session in results))
+    tokens = sum(count for session in results for count, _ in session)
+    seconds = sum(duration for session in results for _, duration in session)
+    print(f"    total: {tokens} prompt tokens evaluated, {seconds:.2f}s of prompt evaluation")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prompt tokens evaluated per turn, before and after the prefix-stable layout.")
+    parser.add_argument("--ollama", action="store_true", help="measure against the local Ollama server instead of the simulated prefix cache")
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--context-budget", type=int, default=8000)
+    args = parser.parse_args()
+
+    options, backend = {}, None
+    if args.ollama:
+        # Only the prompt evaluation matters here.
+        options = {"num_predict": 1, "num_ctx": 16384}
+    else:
+        backend = PrefixCacheBackend()
+        sys.modules["ollama"] = backend.module()
+    import react_agent_from_scratch as scratch
+    scratch._local_models = (0.0, [])
+
+    for layout in ("before", "after"):
+        if backend is not None:
+            backend.cached = ""
+        results = run(scratch, layout, args.sessions, args.turns, args.context_budget, options)
+        report(layout, results)
@@ -0,0 +1,64 @@
+from router import ModelRouter, ollama_backend
+from local_server import serve, FakeModelHandler
+import time
+
+REQUESTS = 200
+# Hedging waits for ceil(min_samples / (1 - percentile)) latencies, 50 at p90, before trusting a percentile.
+WARMUP = 50
+MESSAGES = [{"role": "user", "content": "Question : What is the tallest mountain?"}]
+
+def start_backends():
+    """A fast backend with a slow tail, a steady slower one, and one that always fails."""
+    servers = {}
+    for name, latency, tail_rate, error_rate in (("fast", 0.03, 0.05, 0.0), ("steady", 0.08, 0.0, 0.0), ("failing", 0.01, 0.0, 1.0)):
+        server = serve(FakeModelHandler)
+        server.name, server.latency, server.tail_latency, server.tail_rate, server.error_rate = name, latency, 1.0, tail_rate, error_rate
+        servers[name] = server
+    return servers
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def run(servers, hedge_percentile):
+    backends = [
+        ollama_backend("fake", host=server.url, name=name, failure_threshold=3, cooldown=2.0)
+        for name, server in servers.items()
+    ]
+    router = ModelRouter(backends, hedge_percentile=hedge_percentile)
+    for server in servers.values():
+        server.requests = 0
+    latencies, served_by = [], {}
+    for _ in range(REQUESTS):
+        started = time.perf_counter()
+        response = router.complete(MESSAGES)
+        latencies.append(time.perf_counter() - started)
+        backend = response["content"].rsplit(" ", 1)[-1]
+        served_by[backend] = served_by.get(backend, 0) + 1
+    stats = router.stats()
+    print(f"\nhedging at p{int(hedge_percentile * 100)}" if hedge_percentile else "\nno hedging")
+    for label, window in ((f"first {WARMUP}", latencies[:WARMUP]), (f"last {REQUESTS - WARMUP}", latencies[WARMUP:])):
+        print(
+            f"    {label:<9} latency p50 {percentile(window, 0.5) * 1000:.0f}ms, p95 {percentile(window, 0.95) * 1000:.0f}ms, "
+            f"p99 {percentile(window, 0.99) * 1000:.0f}ms, max {max(window) * 1000:.0f}ms, total {sum(window):.1f}s"
+        )
+    print(f"    answers served by {served_by}")
+    print(f"    requests received {({name: server.requests for name, server in servers.items()})}")
+    print(f"    hedged {stats['hedged']}, hedges won {stats['hedge_wins']}, failovers {stats['failovers']}")
+    for backend in stats["backends"]:
+        ewma = f"{backend['ewma'] * 1000:.0f}ms" if backend["ewma"] is not None else "-"
+        print(f"    {backend['name']:<8} {backend['state']:<10} ewma {ewma:>6}  ok {backend['successes']:>4}  failed {backend['failures']:>3}")
+    router.executor.shutdown(wait=True)
+
+if __name__ == "__main__":
+    servers = start_backends()
+    run(servers, None)
+    run(servers, 0.9)
+
+    # The same router behind the from-scratch agent.
+    import react_agent_from_scratch as scratch
+    router = ModelRouter([ollama_backend("fake", host=server.url, name=name) for name, server in servers.items()])
+    agent = scratch.Agent(None, scratch.system, scratch.tools, router=router)
+    print(f"\nagent answer: {agent.query('What is the tallest mountain?')}")
+    for server in servers.values():
+        server.shutdown()
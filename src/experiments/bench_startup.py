@@ -0,0 +1,45 @@
+import subprocess
+import sys
+import os
+import re
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODULES = ["react_agent_from_scratch", "react_agent_langgraph", "web"]
+IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def import_times(module):
+    """
+    Runs `python -X importtime -c "import <module>"` in a fresh interpreter and returns the cumulative
+    import time of the module and of each of its direct imports, in microseconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    children = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        # Nested imports are printed before their parent, indented by two spaces per level.
+        depth = (len(match.group(3)) - 1) // 2
+        if depth == 1:
+            children.append((match.group(4), int(match.group(2))))
+        elif depth == 0:
+            if match.group(4) == module:
+                return int(match.group(2)), children
+            children = []
+    raise RuntimeError(f"{module} not found in the import time report.")
+
+if __name__ == "__main__":
+    for module in MODULES:
+        try:
+            total, children = import_times(module)
+        except RuntimeError as e:
+            print(f"{module}: import failed ({e})")
+            continue
+        print(f"{module}: {total / 1000:.1f} ms")
+        for package, cumulative in sorted(children, key=lambda child: child[1], reverse=True)[:5]:
+            print(f"    {package:<40}{cumulative / 1000:8.1f} ms")
@@ -0,0 +1,136 @@
+from tool_registry import Tool, ToolRegistry, InvalidArguments
+from types import SimpleNamespace, ModuleType
+from tracing import tracer
+import json
+import time
+import sys
+import os
+
+TRANSCRIPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "transcripts.jsonl")
+REPEAT = 20000
+
+def legacy_spec(func):
+    """Tool.spec before the registry: the f-string was rebuilt on every render of the prompt."""
+    return (f"{{ "
+            f"'name': '{func.__name__}',"
+            f"'module': '{func.__module__}',"
+            f"'annotations': '{func.__annotations__}',"
+            f"'doc': '{func.__doc__}'"
+            f"}}")
+
+# Same signatures as the agent's tools, without the I/O, so that only the call overhead is measured.
+def local_search(query: str, max_results: int = 5) -> dict:
+    """Searches the pages already read."""
+    return {}
+
+def search_tool(query: str, max_results: int = 3) -> list:
+    """A web search engine."""
+    return []
+
+def parse_tool(urls: list[str]) -> dict:
+    """A website parser."""
+    return {}
+
+def calculate(expression: str):
+    """Evaluates a Python literal expression and returns its value."""
+    return expression
+
+def slow_calculate(expression: str):
+    """calculate with the cost of a real evaluation, 100us."""
+    time.sleep(0.0001)
+    return expression
+
+def timed(function, repeat=REPEAT):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+def bench_calls(registry):
+    actions = [json.loads(line) for line in open(TRANSCRIPTS, encoding="utf-8")]
+    actions = [(row["action"], row["args"]) for row in actions if "action" in row]
+    plain = {name: registry[name].func for name in registry}
+
+    def legacy():
+        # The former Tool.__call__: a span around the unchecked call.
+        for name, args in actions:
+            try:
+                with tracer.span("tool", tool=name):
+                    plain[name](**args)
+            except Exception:
+                pass
+
+    def compiled():
+        for name, args in actions:
+            try:
+                registry.call(name, args)
+            except InvalidArguments:
+                pass
+
+    print(f"\ncall of the {len(actions)} fixture actions")
+    print(f"    unchecked dict lookup  {timed(legacy) / len(actions):>6.2f}us per call")
+    print(f"    validated and coerced  {timed(compiled) / len(actions):>6.2f}us per call")
+    for args in ({"query": "angers", "max_results": "5"}, {"query": "angers", "max_results": 4.0}, {"query": "angers", "limit": 3}, {}):
+        try:
+            print(f"    search_tool {args} -> {registry['search_tool'].validate(args)}")
+        except InvalidArguments as e:
+            print(f"    search_tool {args} -> {e}")
+    print(f"    parse_tool {{'urls': 'https://www.angers.fr/'}} -> {registry['parse_tool'].validate({'urls': 'https://www.angers.fr/'})}")
+
+def bench_memo():
+    expressions = [f"{i % 50} * 2" for i in range(2000)]
+    for tool in (Tool(slow_calculate), Tool.pure(slow_calculate)):
+        started = time.perf_counter()
+        for expression in expressions:
+            tool(expression)
+        elapsed = time.perf_counter() - started
+        label = "memoized" if tool.memoize else "uncached"
+        print(f"    {label:<9} {elapsed * 1000:>7.1f}ms for {len(expressions)} calls  {tool.cache_info() or ''}")
+
+def bench_native(final="Answer: About 157,000 inhabitants."):
+    """The agent against a stand-in Ollama that answers with a native tool call, then with `final`."""
+    turns = iter([
+        SimpleNamespace(role="assistant", content="", tool_calls=[
+            SimpleNamespace(function=SimpleNamespace(name="search_tool", arguments={"query": "angers population", "max_results": "2"}))
+        ]),
+        SimpleNamespace(role="assistant", content=final, tool_calls=None),
+        SimpleNamespace(role="assistant", content="Answer: the retry was needed.", tool_calls=None),
+    ])
+    sent = []
+
+    def chat(model, messages, stream=False, options=None, keep_alive=None, tools=None):
+        sent.append(tools)
+        return {"message": next(turns)}
+
+    module = ModuleType("ollama")
+    module.chat = chat
+    module.list = lambda: {"models": [SimpleNamespace(model="fake")]}
+    module.show = lambda model: SimpleNamespace(capabilities=["completion", "tools"])
+    sys.modules["ollama"] = module
+    import react_agent_from_scratch as scratch
+    calls = []
+
+    def search_tool(query: str, max_results: int = 3) -> list:
+        """A web search engine."""
+        calls.append((query, max_results))
+        return [("https://www.angers.fr/", "Angers compte 157 000 habitants.")]
+
+    agent = scratch.Agent("fake", "", {"search_tool": search_tool})
+    answer = agent.query("How many people live in Angers?")
+    print(f"\nnative tool-calling, final reply {final!r}: native_tools={agent.use_native_tools()}, schemas sent {[tool['function']['name'] for tool in sent[0]]}")
+    print(f"    tool called with {calls}")
+    print(f"    answer: {answer}, after {len(sent)} model calls")
+    print(f"    tool messages: {[message for message in agent.messages if message['role'] == 'tool']}")
+
+if __name__ == "__main__":
+    tools = {"calculate": calculate, "local_search": local_search, "search_tool": search_tool, "parse_tool": parse_tool}
+    registry = ToolRegistry(tools)
+    print("spec of the tools for the system prompt")
+    print(f"    rebuilt per render  {timed(lambda: [legacy_spec(function) for function in tools.values()]):>6.2f}us")
+    print(f"    compiled once       {timed(lambda: [registry[name].spec() for name in registry]):>6.2f}us")
+    print(f"    identical text      {[legacy_spec(function) for function in tools.values()] == [registry[name].spec() for name in registry]}")
+    bench_calls(registry)
+    print("\ncalculate on 50 distinct expressions")
+    bench_memo()
+    bench_native()
+    bench_native("About 157,000 inhabitants.")
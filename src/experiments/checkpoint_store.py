@@ -0,0 +1,517 @@
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    WRITES_IDX_MAP,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langchain_core.messages import BaseMessage, ToolMessage
+import hashlib
+import random
+import sqlite3
+import threading
+import logging
+import time
+import zlib
+import os
+
+# Stored values larger than this (bytes) are zlib-compressed.
+COMPRESS_MIN = 512
+# ToolMessage contents longer than this (characters) are stored once per distinct content.
+LARGE_PAYLOAD = 2048
+# Deleted threads after which the items and payloads nothing refers to anymore are collected.
+COLLECT_EVERY = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS {db}threads (
+    thread_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS {db}checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS {db}channel_values (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    type TEXT,
+    data BLOB,
+    base TEXT,
+    length INTEGER,
+    last_hash TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS {db}writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    type TEXT,
+    data BLOB,
+    task_path TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS {db}refs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, owner, position)
+);
+CREATE INDEX IF NOT EXISTS {db}refs_hash ON refs (hash);
+CREATE TABLE IF NOT EXISTS {db}items (
+    hash TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    data BLOB NOT NULL,
+    payload TEXT
+);
+CREATE INDEX IF NOT EXISTS {db}items_payload ON items (payload);
+CREATE TABLE IF NOT EXISTS {db}payloads (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL
+);
+"""
+
+THREAD_TABLES = ("threads", "checkpoints", "channel_values", "writes", "refs")
+
+def compress(data: bytes) -> bytes:
+    if len(data) < COMPRESS_MIN:
+        return b"r" + data
+    return b"z" + zlib.compress(data)
+
+def decompress(data: bytes) -> bytes:
+    return zlib.decompress(data[1:]) if data[:1] == b"z" else data[1:]
+
+def content_hash(*parts) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+class SQLiteCheckpointStore(BaseCheckpointSaver):
+    """
+    Durable LangGraph checkpointer in a local SQLite file, a drop-in replacement of MemorySaver.
+    List channels (the message history) are stored as deltas: each version only records the
+    messages appended since the previous one. Messages are kept once per distinct content, and
+    large ToolMessage contents (fetched pages) once per distinct text, compressed. Nothing is kept
+    in memory between calls: a thread is read back from disk only when it is resumed.
+    Threads idle for more than `max_idle` seconds are deleted, or moved to `archive_path`
+    (a store of the same format) when it is given.
+    """
+    def __init__(self, path: str, max_idle=None, archive_path=None, serde=None):
+        super().__init__(serde=serde)
+        self.path = path
+        self.max_idle = max_idle
+        self.archive_path = archive_path
+        self.stats = {"checkpoints": 0, "deltas": 0, "items_reused": 0, "payloads_reused": 0, "evicted": 0, "collected": 0}
+        self._next_eviction = time.monotonic()
+        self._deleted_since_collect = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA.format(db=""))
+        self._migrate("main")
+        self._db.commit()
+
+    def _migrate(self, db):
+        """Adds the columns of newer versions to a store created by an older one."""
+        columns = [row[1] for row in self._db.execute(f"PRAGMA {db}.table_info(channel_values)")]
+        if "last_hash" not in columns:
+            self._db.execute(f"ALTER TABLE {db}.channel_values ADD COLUMN last_hash TEXT")
+
+    # Values
+
+    def _item(self, message):
+        """(hash, type, data, payload hash, payload text) of one list element."""
+        payload = text = None
+        if isinstance(message, ToolMessage) and isinstance(message.content, str) and len(message.content) > LARGE_PAYLOAD:
+            text = message.content.encode()
+            payload = content_hash(text)
+            message = message.model_copy(update={"content": ""})
+        type_, data = self.serde.dumps_typed(message)
+        return content_hash(type_, data, payload or ""), type_, data, payload, text
+
+    def _put_item(self, message) -> str:
+        """Stores one list element, once per distinct content, and returns its hash."""
+        key, type_, data, payload, text = self._item(message)
+        if payload is not None:
+            inserted = self._db.execute(
+                "INSERT OR IGNORE INTO payloads VALUES (?, ?, ?)", (payload, compress(text), len(text))
+            ).rowcount
+            self.stats["payloads_reused"] += not inserted
+        inserted = self._db.execute(
+            "INSERT OR IGNORE INTO items VALUES (?, ?, ?, ?)", (key, type_, compress(data), payload)
+        ).rowcount
+        self.stats["items_reused"] += not inserted
+        return key
+
+    def _load_items(self, hashes) -> list:
+        rows = {}
+        for start in range(0, len(hashes), 500):
+            batch = list(set(hashes[start:start + 500]))
+            rows.update((row[0], row[1:]) for row in self._db.execute(
+                f"SELECT items.hash, items.type, items.data, payloads.data FROM items "
+                f"LEFT JOIN payloads ON payloads.hash = items.payload "
+                f"WHERE items.hash IN ({','.join('?' * len(batch))})", batch,
+            ))
+        items = []
+        for key in hashes:
+            type_, data, payload = rows[key]
+            item = self.serde.loads_typed((type_, decompress(data)))
+            if payload is not None:
+                item = item.model_copy(update={"content": decompress(payload).decode()})
+            items.append(item)
+        return items
+
+    def _put_refs(self, thread_id, checkpoint_ns, owner, items, start=0) -> list:
+        hashes = [self._put_item(item) for item in items]
+        self._db.executemany(
+            "INSERT OR REPLACE INTO refs VALUES (?, ?, ?, ?, ?)",
+            [(thread_id, checkpoint_ns, owner, start + i, key) for i, key in enumerate(hashes)],
+        )
+        return hashes
+
+    def _ref_hashes(self, thread_id, checkpoint_ns, owners) -> list:
+        if not owners:
+            return []
+        return [row[0] for row in self._db.execute(
+            f"SELECT hash FROM refs WHERE thread_id = ? AND checkpoint_ns = ? "
+            f"AND owner IN ({','.join('?' * len(owners))}) ORDER BY position",
+            (thread_id, checkpoint_ns, *owners),
+        )]
+
+    def _encode(self, value):
+        """(kind, type, data) of a value that is not stored as a message list."""
+        type_, data = self.serde.dumps_typed(value)
+        return "value", type_, compress(data)
+
+    def _decode(self, type_, data):
+        return self.serde.loads_typed((type_, decompress(data)))
+
+    @staticmethod
+    def _is_message_list(value) -> bool:
+        return isinstance(value, list) and bool(value) and all(isinstance(item, BaseMessage) for item in value)
+
+    def _put_channel(self, thread_id, checkpoint_ns, channel, version, value):
+        version = str(version)
+        if not self._is_message_list(value):
+            self._db.execute(
+                "INSERT OR REPLACE INTO channel_values VALUES (?, ?, ?, ?, ?, ?, ?, NULL, NULL, NULL)",
+                (thread_id, checkpoint_ns, channel, version, *self._encode(value)),
+            )
+            return
+        # Store only what was appended to the last stored version. Messages are only ever appended to the
+        # history, so the previous version is taken as a prefix when its last message is found at the
+        # same position: a put costs the new messages, not the whole history.
+        base, start, last = None, 0, None
+        previous = self._db.execute(
+            "SELECT version, length, last_hash FROM channel_values WHERE thread_id = ? AND checkpoint_ns = ? "
+            "AND channel = ? AND kind = 'list' AND version != ? ORDER BY rowid DESC LIMIT 1",
+            (thread_id, checkpoint_ns, channel, version),
+        ).fetchone()
+        if previous and previous[2] and previous[1] <= len(value) and self._item(value[previous[1] - 1])[0] == previous[2]:
+            base, start, last = previous
+            self.stats["deltas"] += 1
+        hashes = self._put_refs(thread_id, checkpoint_ns, f"{channel}@{version}", value[start:], start)
+        self._db.execute(
+            "INSERT OR REPLACE INTO channel_values VALUES (?, ?, ?, ?, 'list', NULL, NULL, ?, ?, ?)",
+            (thread_id, checkpoint_ns, channel, version, base, len(value), hashes[-1] if hashes else last),
+        )
+
+    def _channel_hashes(self, thread_id, checkpoint_ns, channel, version) -> list:
+        """Hashes of the full list stored for `version`, following its chain of deltas in one query."""
+        owners = [f"{channel}@{row[0]}" for row in self._db.execute(
+            "WITH RECURSIVE chain(version, base) AS ("
+            "    SELECT version, base FROM channel_values WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?"
+            "    UNION ALL"
+            "    SELECT channel_values.version, channel_values.base FROM channel_values JOIN chain ON channel_values.version = chain.base"
+            "    WHERE channel_values.thread_id = ? AND channel_values.checkpoint_ns = ? AND channel_values.channel = ?"
+            ") SELECT version FROM chain",
+            (thread_id, checkpoint_ns, channel, version, thread_id, checkpoint_ns, channel),
+        )]
+        return self._ref_hashes(thread_id, checkpoint_ns, owners)
+
+    def _load_channels(self, thread_id, checkpoint_ns, versions) -> dict:
+        values = {}
+        for channel, version in versions.items():
+            row = self._db.execute(
+                "SELECT kind, type, data FROM channel_values WHERE thread_id = ? AND checkpoint_ns = ? "
+                "AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if row is None or row[0] == "empty":
+                continue
+            if row[0] == "list":
+                values[channel] = self._load_items(self._channel_hashes(thread_id, checkpoint_ns, channel, str(version)))
+            else:
+                values[channel] = self._decode(row[1], row[2])
+        return values
+
+    # BaseCheckpointSaver
+
+    def get_next_version(self, current, channel):
+        # A fork (update_state, or a run resumed from an older checkpoint) reuses integer versions, and a
+        # version's refs would then mix both branches. The random part makes every version unique, as in MemorySaver.
+        if current is None:
+            current = 0
+        elif not isinstance(current, int):
+            current = int(current.split(".")[0])
+        return f"{current + 1:032}.{random.random():016}"
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._db.execute(
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._db.execute(
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._load_tuple(thread_id, checkpoint_ns, row[0]) if row else None
+
+    def _load_tuple(self, thread_id, checkpoint_ns, checkpoint_id, metadata=None):
+        parent_id, type_, data, metadata_type, metadata_data = self._db.execute(
+            "SELECT parent_id, type, checkpoint, metadata_type, metadata FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchone()
+        checkpoint = self._decode(type_, data)
+        writes = []
+        for task_id, idx, channel, kind, write_type, write_data in self._db.execute(
+            "SELECT task_id, idx, channel, kind, type, data FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall():
+            if kind == "list":
+                value = self._load_items(self._ref_hashes(thread_id, checkpoint_ns, [f"{checkpoint_id}/{task_id}/{idx}"]))
+            else:
+                value = self._decode(write_type, write_data)
+            writes.append((task_id, channel, value))
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_channels(thread_id, checkpoint_ns, checkpoint["channel_versions"]),
+            },
+            metadata=metadata if metadata is not None else self._decode(metadata_type, metadata_data),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=writes,
+        )
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id, metadata_type, metadata FROM checkpoints WHERE 1"
+        params = []
+        if config:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params.append(before_id)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC", params).fetchall()
+        # Checkpoints are only read back one at a time, as the caller iterates.
+        for thread_id, checkpoint_ns, checkpoint_id, metadata_type, metadata_data in rows:
+            if limit is not None and limit <= 0:
+                break
+            metadata = self._decode(metadata_type, metadata_data)
+            if filter and not all(metadata.get(key) == value for key, value in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            # The lock is released before yielding, the caller may hold on to the generator.
+            with self._lock:
+                loaded = self._load_tuple(thread_id, checkpoint_ns, checkpoint_id, metadata)
+            yield loaded
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint = checkpoint.copy()
+        values = checkpoint.pop("channel_values")
+        with self._lock:
+            for channel, version in new_versions.items():
+                if channel in values:
+                    self._put_channel(thread_id, checkpoint_ns, channel, version, values[channel])
+                else:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO channel_values VALUES (?, ?, ?, ?, 'empty', NULL, NULL, NULL, NULL, NULL)",
+                        (thread_id, checkpoint_ns, channel, str(version)),
+                    )
+            self._db.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                    *self._encode(checkpoint)[1:], *self._encode(get_checkpoint_metadata(config, metadata))[1:],
+                ),
+            )
+            self._touch(thread_id)
+            self._db.commit()
+            self.stats["checkpoints"] += 1
+        self._maybe_evict()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._lock:
+            for idx, (channel, value) in enumerate(writes):
+                idx = WRITES_IDX_MAP.get(channel, idx)
+                # Special writes (errors, interrupts...) are not overwritten once stored.
+                verb = "INSERT OR IGNORE" if idx < 0 else "INSERT OR REPLACE"
+                if self._is_message_list(value):
+                    row = (channel, "list", None, None)
+                    self._put_refs(thread_id, checkpoint_ns, f"{checkpoint_id}/{task_id}/{idx}", value)
+                else:
+                    row = (channel, *self._encode(value))
+                self._db.execute(
+                    f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, *row, task_path),
+                )
+            self._touch(thread_id)
+            self._db.commit()
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            self._delete_threads([thread_id])
+            if self._deleted_since_collect >= COLLECT_EVERY:
+                self.collect()
+            self._db.commit()
+
+    async def aget_tuple(self, config):
+        return self.get_tuple(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return self.delete_thread(thread_id)
+
+    # Eviction
+
+    def _touch(self, thread_id):
+        self._db.execute("INSERT OR REPLACE INTO threads VALUES (?, ?)", (thread_id, time.time()))
+
+    def _delete_threads(self, thread_ids):
+        for table in THREAD_TABLES:
+            self._db.executemany(f"DELETE FROM {table} WHERE thread_id = ?", [(thread_id,) for thread_id in thread_ids])
+        self._deleted_since_collect += len(thread_ids)
+
+    def collect(self) -> int:
+        """
+        Deletes the items and payloads nothing refers to anymore, returns how many items. They are shared
+        between threads, so this sweeps the whole store: it runs every COLLECT_EVERY deleted threads and
+        on eviction rather than on every delete.
+        """
+        with self._lock:
+            items = self._db.execute("DELETE FROM items WHERE NOT EXISTS (SELECT 1 FROM refs WHERE refs.hash = items.hash)").rowcount
+            self._db.execute("DELETE FROM payloads WHERE NOT EXISTS (SELECT 1 FROM items WHERE items.payload = payloads.hash)")
+            self._db.commit()
+            self._deleted_since_collect = 0
+            self.stats["collected"] += items
+        return items
+
+    def _maybe_evict(self):
+        if self.max_idle is None or time.monotonic() < self._next_eviction:
+            return
+        self._next_eviction = time.monotonic() + self.max_idle / 10
+        self.evict()
+
+    def evict(self, max_idle=None) -> int:
+        """Deletes (or archives) the threads idle for more than `max_idle` seconds, returns how many."""
+        max_idle = self.max_idle if max_idle is None else max_idle
+        with self._lock:
+            thread_ids = [row[0] for row in self._db.execute(
+                "SELECT thread_id FROM threads WHERE updated_at < ?", (time.time() - max_idle,)
+            )]
+            if not thread_ids:
+                return 0
+            if self.archive_path:
+                self._archive(thread_ids)
+            self._delete_threads(thread_ids)
+            self.collect()
+            self.stats["evicted"] += len(thread_ids)
+        logging.info(f"Checkpoint store {'archived' if self.archive_path else 'evicted'} {len(thread_ids)} idle threads.")
+        return len(thread_ids)
+
+    def _archive(self, thread_ids):
+        self._db.commit()
+        self._db.execute("ATTACH DATABASE ? AS archive", (self.archive_path,))
+        try:
+            self._db.executescript(SCHEMA.format(db="archive."))
+            self._migrate("archive")
+            self._db.execute("CREATE TEMP TABLE archived (thread_id TEXT PRIMARY KEY)")
+            self._db.executemany("INSERT INTO archived VALUES (?)", [(thread_id,) for thread_id in thread_ids])
+            for table in THREAD_TABLES:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO archive.{table} SELECT * FROM main.{table} "
+                    f"WHERE thread_id IN (SELECT thread_id FROM archived)"
+                )
+            self._db.execute(
+                "INSERT OR IGNORE INTO archive.items SELECT * FROM main.items WHERE hash IN "
+                "(SELECT hash FROM main.refs WHERE thread_id IN (SELECT thread_id FROM archived))"
+            )
+            self._db.execute(
+                "INSERT OR IGNORE INTO archive.payloads SELECT * FROM main.payloads WHERE hash IN "
+                "(SELECT payload FROM archive.items)"
+            )
+            self._db.execute("DROP TABLE archived")
+            self._db.commit()
+        finally:
+            self._db.execute("DETACH DATABASE archive")
+
+    def size(self) -> dict:
+        """Number of rows per table, and bytes of stored payloads before compression."""
+        with self._lock:
+            counts = {
+                table: self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in (*THREAD_TABLES, "items", "payloads")
+            }
+            counts["payload_bytes"] = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM payloads").fetchone()[0]
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,83 @@
+from lxml import etree
+
+SKIPPED_TAGS = {"script", "style", "header", "footer", "nav", "aside"}
+# Strings inside these tags are not NavigableStrings for BeautifulSoup, so get_text leaves them out.
+STRING_CONTAINERS = {"rt", "rp", "template"}
+
+class TextExtractor:
+    """
+    Incremental equivalent of `extract_text(BeautifulSoup(html))`: feed it HTML chunks as they arrive.
+    Skipped subtrees are never built and parsing stops once `max_chars` characters of text are collected.
+    """
+    def __init__(self, max_chars=None):
+        self.max_chars = max_chars
+        self.done = False
+        self._strings = []
+        self._size = 0
+        self._buffer = []
+        self._skipping = 0
+        self._containers = 0
+        self._parser = etree.HTMLParser(target=self, strip_cdata=False, recover=True)
+
+    def feed(self, chunk: str):
+        if not self.done:
+            self._parser.feed(chunk)
+
+    def close(self) -> str:
+        try:
+            self._parser.close()
+        except etree.XMLSyntaxError:
+            # Raised when nothing was fed, e.g. an empty body.
+            pass
+        self._flush()
+        text = "\n".join(self._strings)
+        return text[:self.max_chars] if self.max_chars else text
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        string = "".join(self._buffer).strip()
+        self._buffer = []
+        if not string or self.done:
+            return
+        self._strings.append(string)
+        self._size += len(string) + 1
+        if self.max_chars and self._size > self.max_chars:
+            self.done = True
+
+    # lxml parser target interface
+
+    def start(self, tag, attrib, nsmap=None):
+        self._flush()
+        if self._skipping or tag in SKIPPED_TAGS:
+            self._skipping += 1
+        elif tag in STRING_CONTAINERS:
+            self._containers += 1
+
+    def end(self, tag):
+        self._flush()
+        if self._skipping:
+            self._skipping -= 1
+        elif tag in STRING_CONTAINERS:
+            self._containers -= 1
+
+    def data(self, data):
+        if not self._skipping and not self._containers:
+            self._buffer.append(data)
+
+    def comment(self, text):
+        self._flush()
+
+    def pi(self, target, data=None):
+        self._flush()
+
+    def doctype(self, *args):
+        self._flush()
+
+def extract_html(html: str, max_chars=None, chunk_size=64 * 1024) -> str:
+    extractor = TextExtractor(max_chars=max_chars)
+    for i in range(0, len(html), chunk_size):
+        extractor.feed(html[i:i + chunk_size])
+        if extractor.done:
+            break
+    return extractor.close()
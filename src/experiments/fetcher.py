@@ -0,0 +1,141 @@
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, wait
+from collections import namedtuple
+from urllib.parse import urlsplit
+from tracing import tracer
+import threading
+import contextvars
+import codecs
+import logging
+import time
+
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
+
+Page = namedtuple("Page", ["url", "status", "text", "headers"])
+
+class FetchError(Exception):
+    pass
+
+class Fetcher:
+    """
+    Downloads pages concurrently through one pooled keep-alive session.
+    Each host gets at most `per_host` simultaneous connections, each request is bounded by
+    `timeout` seconds and `max_bytes` bytes, and `fetch_all` returns whatever finished before `deadline`.
+    `max_bytes_per_second` caps the bandwidth shared by all the downloads, None leaves it unbounded.
+    """
+    def __init__(self, max_workers=8, per_host=2, timeout=10.0, deadline=20.0, max_bytes=2_000_000, chunk_size=64 * 1024,
+                 max_bytes_per_second=None):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.max_bytes_per_second = max_bytes_per_second
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetcher")
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+        self._available_at = time.monotonic()
+        self._throttle_lock = threading.Lock()
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._hosts_lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return self._hosts[host]
+
+    def _throttle(self, size):
+        """Sleeps long enough for the downloads to stay under `max_bytes_per_second` (a leaky bucket)."""
+        if not self.max_bytes_per_second:
+            return
+        with self._throttle_lock:
+            now = time.monotonic()
+            delay = self._available_at - now
+            self._available_at = max(now, self._available_at) + size / self.max_bytes_per_second
+        if delay > 0:
+            time.sleep(delay)
+
+    def fetch(self, url: str, timeout=None) -> str:
+        return self.fetch_page(url, timeout=timeout).text
+
+    def fetch_page(self, url: str, timeout=None, headers=None, extractor=None) -> Page:
+        """
+        Downloads `url`. When `extractor` (a TextExtractor factory) is given, the body is parsed as it
+        streams in, the download stops once the extractor's text budget is reached, and `Page.text`
+        holds the extracted text instead of the HTML.
+        """
+        if not url:
+            raise ValueError("The URL is missing.")
+        timeout = timeout or self.timeout
+        with tracer.span("fetch", host=urlsplit(url).netloc, streaming=extractor is not None) as span:
+            page = self._fetch_page(url, timeout, headers, extractor, span)
+            span.set(status=str(page.status))
+            return page
+
+    def _fetch_page(self, url, timeout, headers, extractor, span):
+        # `timeout` covers the download only, the wait for a slot on the host counts against fetch_all's deadline.
+        with self._host_slot(url):
+            started = time.monotonic()
+            with self.session.get(url, stream=True, timeout=timeout, headers=headers) as response:
+                encoding = response.encoding or "utf-8"
+                if extractor is not None:
+                    sink = extractor()
+                    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+                else:
+                    sink = None
+                    chunks = []
+                size = 0
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    size += len(chunk)
+                    self._throttle(len(chunk))
+                    if sink is not None:
+                        sink.feed(decoder.decode(chunk))
+                        if sink.done:
+                            break
+                    else:
+                        chunks.append(chunk)
+                    if size >= self.max_bytes:
+                        logging.info(f"{url} exceeded {self.max_bytes} bytes, truncating.")
+                        break
+                    if time.monotonic() - started > timeout:
+                        raise FetchError(f"{url} took more than {timeout}s to download.")
+                span.set(bytes=size)
+                if sink is not None:
+                    sink.feed(decoder.decode(b"", final=True))
+                    return Page(url, response.status_code, sink.close(), response.headers)
+                body = b"".join(chunks)[:self.max_bytes]
+                text = body.decode(encoding, errors="replace")
+                return Page(url, response.status_code, text, response.headers)
+
+    def fetch_all(self, urls: list[str], deadline=None, headers=None, extractor=None) -> dict:
+        """Returns {url: Page} for the URLs fetched before the deadline, `headers` maps URLs to extra request headers."""
+        deadline = deadline or self.deadline
+        headers = headers or {}
+        futures = {
+            self.executor.submit(contextvars.copy_context().run, self.fetch_page, url, headers=headers.get(url), extractor=extractor): url
+            for url in dict.fromkeys(urls)
+        }
+        done, pending = wait(futures, timeout=deadline)
+        for future in pending:
+            future.cancel()
+            logging.info(f"{futures[future]} did not finish within {deadline}s, skipping it.")
+        pages = {}
+        for future in done:
+            url = futures[future]
+            try:
+                pages[url] = future.result()
+            except Exception as e:
+                logging.info(f"An error has been raised while fetching {url}: {e}")
+        return {url: pages[url] for url in urls if url in pages}
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
@@ -0,0 +1,149 @@
+from observation import chunk_text, tokenize
+from page_cache import normalize_url
+from collections import namedtuple, defaultdict
+from array import array
+import hashlib
+import sqlite3
+import threading
+import math
+import os
+
+Hit = namedtuple("Hit", ["url", "text", "score"])
+
+def ollama_embedder(model="nomic-embed-text"):
+    """Embeds a list of texts with the local Ollama embeddings endpoint."""
+    import ollama
+
+    def embed(texts):
+        return ollama.embed(model=model, input=texts)["embeddings"]
+    return embed
+
+def cosine(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+class LocalIndex:
+    """
+    Persistent BM25 index (SQLite FTS5) of the pages the agents have already read, chunk by chunk.
+    Re-adding a page only touches the chunks whose text changed. With `embed` (a function mapping a
+    list of texts to vectors, e.g. ollama_embedder()), new chunks are embedded as they are added and
+    the best `candidates` BM25 hits are re-ranked with the query embedding (reciprocal rank fusion).
+    """
+    def __init__(self, path: str, chunk_words=120, embed=None, candidates=50):
+        self.path = path
+        self.chunk_words = chunk_words
+        self.embed = embed
+        self.candidates = candidates
+        self.stats = {"pages": 0, "chunks_added": 0, "chunks_removed": 0, "queries": 0}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                key TEXT NOT NULL,
+                url TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                text TEXT NOT NULL,
+                vector BLOB
+            );
+            CREATE INDEX IF NOT EXISTS chunks_key ON chunks (key);
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                text, content='chunks', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+            );
+        """)
+        self._db.commit()
+
+    def add(self, url: str, text: str) -> tuple:
+        """Indexes (or re-indexes) the text of a page, returns the number of chunks added and removed."""
+        key = normalize_url(url)
+        chunks = [chunk for chunk in chunk_text(text, self.chunk_words) if chunk.strip()]
+        hashes = [hashlib.blake2b(chunk.encode(), digest_size=16).hexdigest() for chunk in chunks]
+        with self._lock:
+            existing = defaultdict(list)
+            for chunk_id, chunk_hash, chunk in self._db.execute("SELECT id, hash, text FROM chunks WHERE key = ?", (key,)):
+                existing[chunk_hash].append((chunk_id, chunk))
+
+            kept, added = [], []
+            for position, (chunk_hash, chunk) in enumerate(zip(hashes, chunks)):
+                if existing[chunk_hash]:
+                    kept.append((position, url, existing[chunk_hash].pop()[0]))
+                else:
+                    added.append((position, chunk_hash, chunk))
+            removed = [row for rows in existing.values() for row in rows]
+
+            self._db.executemany("DELETE FROM chunks WHERE id = ?", [(chunk_id,) for chunk_id, _ in removed])
+            self._db.executemany(
+                "INSERT INTO chunks_fts (chunks_fts, rowid, text) VALUES ('delete', ?, ?)", removed
+            )
+            self._db.executemany("UPDATE chunks SET position = ?, url = ? WHERE id = ?", kept)
+            vectors = self.embed([chunk for _, _, chunk in added]) if self.embed and added else None
+            for i, (position, chunk_hash, chunk) in enumerate(added):
+                vector = array("f", vectors[i]).tobytes() if vectors else None
+                chunk_id = self._db.execute(
+                    "INSERT INTO chunks (key, url, position, hash, text, vector) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, url, position, chunk_hash, chunk, vector),
+                ).lastrowid
+                self._db.execute("INSERT INTO chunks_fts (rowid, text) VALUES (?, ?)", (chunk_id, chunk))
+            self._db.commit()
+            self.stats["pages"] += 1
+            self.stats["chunks_added"] += len(added)
+            self.stats["chunks_removed"] += len(removed)
+        return len(added), len(removed)
+
+    def remove(self, url: str) -> int:
+        key = normalize_url(url)
+        with self._lock:
+            rows = self._db.execute("SELECT id, text FROM chunks WHERE key = ?", (key,)).fetchall()
+            self._db.executemany("INSERT INTO chunks_fts (chunks_fts, rowid, text) VALUES ('delete', ?, ?)", rows)
+            self._db.execute("DELETE FROM chunks WHERE key = ?", (key,))
+            self._db.commit()
+            self.stats["chunks_removed"] += len(rows)
+        return len(rows)
+
+    def search(self, query: str, k=5) -> list:
+        """The `k` chunks that best match `query`, best first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        limit = max(k, self.candidates) if self.embed else k
+        with self._lock:
+            self.stats["queries"] += 1
+            rows = self._db.execute(
+                "SELECT chunks.url, chunks.text, chunks.vector, chunks_fts.rank FROM chunks_fts "
+                "JOIN chunks ON chunks.id = chunks_fts.rowid "
+                "WHERE chunks_fts MATCH ? ORDER BY chunks_fts.rank LIMIT ?",
+                (match, limit),
+            ).fetchall()
+        # FTS5 ranks are negated BM25 scores.
+        hits = [Hit(url, text, -rank) for url, text, _, rank in rows]
+        if not self.embed or not rows:
+            return hits
+        query_vector = self.embed([query])[0]
+        similarities = [cosine(query_vector, array("f", vector)) if vector else 0.0 for _, _, vector, _ in rows]
+        by_similarity = sorted(range(len(rows)), key=lambda i: similarities[i], reverse=True)
+        fused = {i: 1 / (60 + rank) for rank, i in enumerate(range(len(rows)))}
+        for rank, i in enumerate(by_similarity):
+            fused[i] += 1 / (60 + rank)
+        return [hits[i]._replace(score=fused[i]) for i in sorted(fused, key=fused.get, reverse=True)[:k]]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM chunks")
+            self._db.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('delete-all')")
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,131 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import threading
+import random
+import json
+import time
+import os
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pages")
+
+PAGE = "<html><head><title>{title}</title><script>var x = 1;</script></head><body><nav>menu</nav><p>{body}</p></body></html>"
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Serves synthetic pages for benchmarks:
+    /fast, /slow?delay=<s>, /large?size=<bytes>, /stall?delay=<s> (sends the body slowly, byte by byte),
+    /etag (answers 304 to a matching If-None-Match), /pages/<name> (a file of fixtures/pages).
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        delay = float(params.get("delay", 1.0))
+
+        if url.path == "/slow":
+            time.sleep(delay)
+            return self.send_page(PAGE.format(title="slow", body=f"Slept {delay}s."))
+        if url.path == "/large":
+            size = int(params.get("size", 5_000_000))
+            filler = "lorem ipsum dolor sit amet " * (size // 27 + 1)
+            return self.send_page(PAGE.format(title="large", body=filler[:size]))
+        if url.path.startswith("/pages/"):
+            path = os.path.join(FIXTURES, os.path.basename(url.path))
+            if not os.path.isfile(path):
+                return self.send_page(PAGE.format(title="not found", body=url.path), status=404)
+            with open(path, encoding="utf-8") as f:
+                return self.send_page(f.read())
+        if url.path == "/etag":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            return self.send_page(PAGE.format(title="etag", body="Versioned page."), headers={"ETag": '"v1"'})
+        if url.path == "/stall":
+            body = PAGE.format(title="stall", body="x" * 64).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            for i in range(len(body)):
+                self.wfile.write(body[i:i + 1])
+                self.wfile.flush()
+                time.sleep(delay / len(body))
+            return
+        return self.send_page(PAGE.format(title="fast", body=f"Page {url.path}."))
+
+    def send_page(self, html, status=200, headers=None):
+        body = html.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeModelHandler(BaseHTTPRequestHandler):
+    """
+    Ollama-compatible POST /api/chat for router benchmarks. It answers after `server.latency` seconds,
+    or `server.tail_latency` for a `server.tail_rate` share of the requests, and fails with a 500
+    for an `server.error_rate` share. Set these attributes on the server returned by `serve`.
+    """
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes, without this each answer waits for a delayed ACK.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            failing = server.random.random() < getattr(server, "error_rate", 0.0)
+            slow = server.random.random() < getattr(server, "tail_rate", 0.0)
+        time.sleep(getattr(server, "tail_latency", 1.0) if slow else getattr(server, "latency", 0.05))
+        if failing:
+            body = json.dumps({"error": "backend failure"}).encode()
+            status = 500
+        else:
+            body = json.dumps({
+                "model": request.get("model", ""),
+                "created_at": "2025-01-01T00:00:00Z",
+                "message": {"role": "assistant", "content": f"Answer: served by {server.name}"},
+                "done": True,
+            }).encode()
+            status = 200
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients giving up on slow or truncated responses is expected here.
+        pass
+
+def serve(handler=StandInHandler, host="127.0.0.1", port=0):
+    """
+    Starts the server in a daemon thread and returns it, its base URL is in `server.url`.
+    `server.host_url(i)` gives a distinct loopback host (127.0.0.<i>) when bound to "0.0.0.0".
+    """
+    server = StandInServer((host, port), handler)
+    port = server.server_address[1]
+    server.url = f"http://127.0.0.1:{port}"
+    server.host_url = lambda i: f"http://127.0.0.{i % 254 + 1}:{port}"
+    server.name = server.url
+    server.lock = threading.Lock()
+    server.random = random.Random(port)
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,100 @@
+from observation import count_tokens
+
+def summarize_message(message) -> str:
+    """Cheap extractive summary of an evicted message, used unless a summarizer is given."""
+    content = message["content"].strip()
+    if message["role"] == "user":
+        return content[:500]
+    if message.get("tool_calls"):
+        return "\n".join(f"Action: {call['function']['name']}: {call['function']['arguments']}" for call in message["tool_calls"])[:500]
+    if message["role"] == "tool" or content.startswith("Observation:"):
+        return content[:300] + (" [...]" if len(content) > 300 else "")
+    lines = [line for line in content.split("\n") if line.strip().startswith(("Action", "Answer"))]
+    return "\n".join(lines)[:500] if lines else content[:200]
+
+class ConversationMemory:
+    """
+    Keeps the system prompt and the most recent messages verbatim and folds older ones into a
+    rolling summary, so that `context()` stays within `context_budget` tokens.
+    `summarize(message) -> str` can be replaced, e.g. by a call to the model.
+    Once over budget, the history is compacted down to `compact_to` of the budget in one go, so that
+    the context stays append-only (and the backend's prompt cache valid) until the next compaction.
+    """
+    def __init__(self, context_budget=8000, keep_recent=4, summarize=summarize_message, compact_to=0.6):
+        self.context_budget = context_budget
+        self.compact_to = compact_to
+        self.keep_recent = keep_recent
+        self.summarize = summarize
+        self.system = None
+        self.summary = []
+        self.messages = []
+        self.tokens = []
+
+    def add(self, message):
+        if message["role"] == "system" and self.system is None and not self.messages:
+            self.system = message
+            return
+        self.messages.append(message)
+        self.tokens.append(count_tokens(message["content"]))
+        self._fit()
+
+    def token_count(self) -> int:
+        system = count_tokens(self.system["content"]) if self.system else 0
+        return system + sum(count_tokens(line) for line in self.summary) + sum(self.tokens)
+
+    def _fit(self):
+        if not self.context_budget or self.token_count() <= self.context_budget:
+            return
+        # Results of native tool calls go together with the call, the API rejects them on their own.
+        while self.messages and (
+            self.messages[0]["role"] == "tool"
+            or self.token_count() > self.context_budget * self.compact_to and len(self.messages) > self.keep_recent
+        ):
+            message = self.messages.pop(0)
+            self.tokens.pop(0)
+            line = self.summarize(message)
+            if line:
+                self.summary.append(f"{message['role'].upper()}: {line}")
+        # The summary gets at most a quarter of the budget, oldest lines go first.
+        while self.summary and sum(count_tokens(line) for line in self.summary) > self.context_budget // 4:
+            self.summary.pop(0)
+        # The kept messages alone can be over budget, e.g. large search results: observations are cut
+        # short first, oldest first, then the largest other messages.
+        observations = [i for i, message in enumerate(self.messages) if message["role"] == "tool" or message["content"].startswith("Observation:")]
+        others = sorted(set(range(len(self.messages))) - set(observations), key=lambda i: -self.tokens[i])
+        for index in observations + others:
+            excess = self.token_count() - int(self.context_budget * self.compact_to)
+            if excess <= 0:
+                break
+            self._shorten(index, excess)
+
+    def _shorten(self, index, excess):
+        """Cuts about `excess` tokens off the end of message `index`, keeping its first line or so."""
+        message = self.messages[index]
+        marker = " [truncated]"
+        keep = max(80, len(message["content"]) - excess * 4 - len(marker))
+        if keep >= len(message["content"]):
+            return
+        content = message["content"][:keep] + marker
+        self.messages[index] = {**message, "content": content}
+        self.tokens[index] = count_tokens(content)
+
+    def context(self) -> list:
+        messages = [self.system] if self.system else []
+        if self.summary:
+            messages.append({"role": "user", "content": "Summary of the earlier conversation:\n" + "\n".join(self.summary)})
+        return messages + self.messages
+
+    def snapshot(self):
+        """State that `restore` brings back, e.g. to forget a question that could not be answered."""
+        return self.system, list(self.summary), list(self.messages), list(self.tokens)
+
+    def restore(self, snapshot):
+        system, summary, messages, tokens = snapshot
+        self.system, self.summary, self.messages, self.tokens = system, list(summary), list(messages), list(tokens)
+
+    def reset(self):
+        """Forgets everything but the system prompt."""
+        self.summary = []
+        self.messages = []
+        self.tokens = []
@@ -0,0 +1,82 @@
+from collections import Counter
+import math
+import re
+
+WORD_RE = re.compile(r"\w+")
+
+def count_tokens(text: str) -> int:
+    # Roughly 4 characters per token for the models we run, close enough for budgeting.
+    return len(text) // 4 + 1
+
+def tokenize(text: str) -> list[str]:
+    return WORD_RE.findall(text.lower())
+
+def chunk_text(text: str, chunk_words=120) -> list[str]:
+    """Groups lines into chunks of about `chunk_words` words, splitting lines that are longer than that."""
+    chunks, lines, words = [], [], 0
+    for line in text.split("\n"):
+        line_words = line.split()
+        while len(line_words) > chunk_words:
+            if lines:
+                chunks.append("\n".join(lines))
+                lines, words = [], 0
+            chunks.append(" ".join(line_words[:chunk_words]))
+            line_words = line_words[chunk_words:]
+            line = " ".join(line_words)
+        lines.append(line)
+        words += len(line_words)
+        if words >= chunk_words:
+            chunks.append("\n".join(lines))
+            lines, words = [], 0
+    if lines:
+        chunks.append("\n".join(lines))
+    return chunks
+
+def bm25_scores(documents: list[list[str]], query: list[str], k1=1.5, b=0.75) -> list[float]:
+    if not documents:
+        return []
+    average_length = sum(len(document) for document in documents) / len(documents) or 1
+    document_frequency = Counter(term for document in documents for term in set(document))
+    idf = {
+        term: math.log(1 + (len(documents) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+        for term in set(query)
+    }
+    scores = []
+    for document in documents:
+        frequencies = Counter(document)
+        norm = k1 * (1 - b + b * len(document) / average_length)
+        scores.append(sum(
+            idf[term] * frequencies[term] * (k1 + 1) / (frequencies[term] + norm)
+            for term in idf if frequencies[term]
+        ))
+    return scores
+
+def compress_pages(pages: dict, question: str, budget_tokens=2000, chunk_words=120) -> dict:
+    """
+    Keeps the passages of {url: text} that best match `question` (BM25) within `budget_tokens`.
+    Each page's best passage is considered first so several sources survive, every URL is kept
+    (possibly empty) so it can still be cited, and passages stay in page order.
+    """
+    if sum(count_tokens(text) for text in pages.values()) <= budget_tokens:
+        return pages
+
+    chunks = [(url, i, chunk) for url, text in pages.items() for i, chunk in enumerate(chunk_text(text, chunk_words))]
+    scores = bm25_scores([tokenize(chunk) for _, _, chunk in chunks], tokenize(question))
+    ranked = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)
+
+    best_per_url = {}
+    for i in ranked:
+        best_per_url.setdefault(chunks[i][0], i)
+    selected, used = set(), 0
+    for i in list(best_per_url.values()) + ranked:
+        cost = count_tokens(chunks[i][2])
+        if i in selected or used + cost > budget_tokens:
+            continue
+        selected.add(i)
+        used += cost
+
+    compressed = {url: [] for url in pages}
+    for i in sorted(selected):
+        url, _, chunk = chunks[i]
+        compressed[url].append(chunk)
+    return {url: "\n[...]\n".join(passages) for url, passages in compressed.items()}
@@ -0,0 +1,120 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import sqlite3
+import threading
+import logging
+import time
+import os
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+class PageCache:
+    """
+    Persistent cache of extracted page text, keyed by normalized URL.
+    Entries younger than `ttl` seconds are served without touching the network, older ones are
+    revalidated with their ETag/Last-Modified, and the least recently used entries are evicted
+    once the stored text exceeds `max_bytes`.
+    """
+    def __init__(self, path: str, ttl=3600.0, max_bytes=200_000_000):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "evictions": 0}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at)")
+        self._db.commit()
+
+    def get(self, url: str):
+        """Returns the fresh cached text for `url`, or None if it is missing or expired."""
+        key = normalize_url(url)
+        with self._lock:
+            row = self._db.execute("SELECT text, fetched_at FROM pages WHERE url = ?", (key,)).fetchone()
+            if row is None or time.time() - row[1] > self.ttl:
+                self.stats["misses"] += 1
+                return None
+            self._db.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), key))
+            self._db.commit()
+            self.stats["hits"] += 1
+            return row[0]
+
+    def validators(self, url: str) -> dict:
+        """Returns the conditional request headers for a stale entry, empty if it cannot be revalidated."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified FROM pages WHERE url = ?", (normalize_url(url),)
+            ).fetchone()
+        if row is None:
+            return {}
+        headers = {}
+        if row[0]:
+            headers["If-None-Match"] = row[0]
+        if row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def revalidate(self, url: str):
+        """Marks a stale entry as fresh again after a 304 response and returns its text."""
+        key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, key))
+            self._db.commit()
+            row = self._db.execute("SELECT text FROM pages WHERE url = ?", (key,)).fetchone()
+            if row is not None:
+                self.stats["revalidated"] += 1
+            return row[0] if row else None
+
+    def put(self, url: str, text: str, etag=None, last_modified=None):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (normalize_url(url), text, etag, last_modified, now, now, len(text.encode())),
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT url, size FROM pages ORDER BY accessed_at").fetchall()
+        for url, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM pages WHERE url = ?", (url,))
+            total -= size
+            self.stats["evictions"] += 1
+        logging.info(f"Page cache evicted down to {total} bytes.")
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM pages")
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from collections import OrderedDict
+from page_cache import normalize_url
+import threading
+import logging
+import time
+
+class Prefetcher:
+    """
+    Speculatively downloads the search results the model is likely to parse on its next turn.
+    `speculate(urls)` starts fetching them in the background with `fetch` (a function mapping a list
+    of URLs to {url: text}), `max_concurrency` at a time and at most `max_pending` waiting.
+    `take(urls)` returns the texts that are ready and waits for the ones still in flight, the caller
+    fetches the rest itself. Speculative results not taken within `ttl` seconds are dropped.
+    """
+    def __init__(self, fetch, max_concurrency=2, max_pending=8, ttl=120.0, wait_timeout=20.0):
+        self.fetch = fetch
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.stats = {"speculated": 0, "ready": 0, "attached": 0, "failed": 0, "wasted": 0, "skipped": 0}
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="prefetch")
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def speculate(self, urls: list[str]):
+        with self._lock:
+            self._expire()
+            for url in urls:
+                key = normalize_url(url)
+                if key in self._entries:
+                    continue
+                if sum(not future.done() for future, _ in self._entries.values()) >= self.max_pending:
+                    self.stats["skipped"] += 1
+                    continue
+                self._entries[key] = (self.executor.submit(self._fetch_one, url), time.monotonic())
+                self.stats["speculated"] += 1
+
+    def _fetch_one(self, url):
+        return self.fetch([url]).get(url)
+
+    def take(self, urls: list[str]) -> dict:
+        """{url: text} of the speculated URLs among `urls`, waiting for the downloads still in flight."""
+        with self._lock:
+            self._expire()
+            claimed = {}
+            for url in urls:
+                entry = self._entries.pop(normalize_url(url), None)
+                if entry is not None:
+                    claimed[url] = entry[0]
+        texts = {}
+        deadline = time.monotonic() + self.wait_timeout
+        for url, future in claimed.items():
+            outcome = "ready" if future.done() else "attached"
+            try:
+                text = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except TimeoutError:
+                text = None
+            except Exception as e:
+                logging.info(f"Prefetching {url} failed: {e}")
+                text = None
+            with self._lock:
+                self.stats[outcome if text is not None else "failed"] += 1
+            if text is not None:
+                texts[url] = text
+        return texts
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._entries:
+            key, (future, started_at) = next(iter(self._entries.items()))
+            if now - started_at <= self.ttl:
+                break
+            future.cancel()
+            del self._entries[key]
+            self.stats["wasted"] += 1
+
+    def report(self) -> dict:
+        """The stats, with the share of speculative downloads that were used (`paid_off`)."""
+        with self._lock:
+            stats = dict(self.stats, unclaimed=len(self._entries))
+        used = stats["ready"] + stats["attached"]
+        stats["paid_off"] = used / stats["speculated"] if stats["speculated"] else 0.0
+        return stats
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,28 @@
+from datetime import date
+
+class Preamble:
+    """
+    System prompt that stays byte-identical for a whole day, so that the backend can reuse its
+    prompt (KV) cache across turns and sessions. `render(day)` builds the text and is only called
+    again once the date changes.
+    """
+    def __init__(self, render):
+        self.render = render
+        self.day = None
+        self.text = ""
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """Re-renders the text if the day changed, returns whether it did."""
+        day = date.today()
+        if day == self.day:
+            return False
+        self.day, self.text = day, self.render(day)
+        return True
+
+    def __str__(self):
+        self.refresh()
+        return self.text
+
+    def __bool__(self):
+        return bool(self.text)
@@ -1,66 +1,122 @@
-import ollama
-from openai import OpenAI
-import re
-import requests
-from ddgs import DDGS
-from bs4 import BeautifulSoup
-from datetime import datetime
+from web import ddg_search, scrape_websites, search_local_index
+from observation import compress_pages, count_tokens
+from memory import ConversationMemory
+from react_parser import parse_step
+from tracing import tracer, Preview
+from prompts import Preamble
+from tool_registry import Tool, ToolRegistry, InvalidArguments
 import logging
 import ast
+import time
+from functools import lru_cache
 
 #TODO Make hallucination safeguard
 
-logging.basicConfig(level=logging.INFO)
-
 API_KEY_PATH = "../api_keys/openrouter.txt"
-API_KEY = open(API_KEY_PATH, "r").readline()
-
-class Tool:
-    def __init__(self, func):
-        self.func = func
-
-    def spec(self):
-        return (f"{{ "
-                f"'name': '{self.func.__name__}',"
-                f"'module': '{self.func.__module__}',"
-                f"'annotations': '{self.func.__annotations__}',"
-                f"'doc': '{self.func.__doc__}'"
-                f"}}")
-
-    def __call__(self, *args, **kwargs):
-        return self.func(*args, **kwargs)
+OPENROUTER_URL = "https://openrouter.ai/api/v1"
+OPENROUTER_MODELS = [
+    "deepseek/deepseek-r1-distill-llama-70b:free",
+    "x-ai/grok-4.1-fast:free",
+    "google/gemma-3-27b-it:free",
+    "deepseek/deepseek-chat-v3-0324:free"
+]
+# Seconds during which the list of local Ollama models is reused.
+MODELS_TTL = 300
+
+@lru_cache(maxsize=None)
+def load_api_key():
+    return open(API_KEY_PATH, "r").readline()
+
+_local_models = (0.0, [])
+
+def available_models(local: bool = True) -> list:
+    global _local_models
+    if not local:
+        return OPENROUTER_MODELS
+    fetched_at, models = _local_models
+    if time.monotonic() - fetched_at > MODELS_TTL:
+        import ollama
+        models = [model.model for model in ollama.list()["models"]]
+        _local_models = (time.monotonic(), models)
+    return models
+
+_tool_support = {}
+
+def supports_tools(model: str) -> bool:
+    """
+    Whether the local Ollama model can call tools natively (its template handles `tools`). The answer is
+    reused for MODELS_TTL seconds, a failed lookup is not cached so the next call asks again.
+    """
+    checked = _tool_support.get(model)
+    if checked is not None and time.monotonic() - checked[0] <= MODELS_TTL:
+        return checked[1]
+    import ollama
+    try:
+        supported = "tools" in (ollama.show(model).capabilities or [])
+    except Exception as e:
+        logging.info(f"Could not read the capabilities of {model}: {e!r}")
+        return False
+    _tool_support[model] = (time.monotonic(), supported)
+    return supported
+
+RETRY_MESSAGE = "You incorrectly followed the process, resulting to no answer. Watch again how the process works and redo the 'Thought' step."
 
 class Agent:
-    def __init__(self, model: str, system: str, tools: dict, local: bool = True):
+    def __init__(self, model: str, system, tools: dict, local: bool = True, observation_budget: int = 2000, context_budget: int = 8000,
+                 keep_alive=None, options=None, router=None, native_tools=None):
         self.local = local
-
-        if local:
-            self.client = None
-            models_list = [model.model for model in ollama.list()["models"]]
-        else:
-            self.client = OpenAI(
-                base_url="https://openrouter.ai/api/v1",
-                api_key=API_KEY,
-            )
-            models_list = [
-                "deepseek/deepseek-r1-distill-llama-70b:free",
-                "x-ai/grok-4.1-fast:free",
-                "google/gemma-3-27b-it:free",
-                "deepseek/deepseek-chat-v3-0324:free"
-            ]
-        if model not in models_list:
-            raise ValueError(f"{model} is not available. Available models : {models_list}")
+        # A ModelRouter spreading the requests over several backends, instead of the single `model`.
+        self.router = router
+        self.observation_budget = observation_budget
+        # Passed through to Ollama: how long the model (and its prompt cache) stays loaded, and e.g. num_ctx.
+        self.keep_alive = keep_alive
+        self.options = options or {}
+        self.usage = {}
+        self.client = None
+        self.async_client = None
+        self.metrics = []
+        # URLs of the pages shown to the model during the last query, recorded as the tools run.
+        self.sources = []
+
+        if router is None:
+            models_list = available_models(local)
+            if model not in models_list:
+                raise ValueError(f"{model} is not available. Available models : {models_list}")
 
         self.model = model
         self.system = system
-        self.messages = []
+        self.memory = ConversationMemory(context_budget=context_budget)
         if self.system:
-            self.add_message({"role": "system", "content": self.system})
-        self.tools = tools
-    
+            self.add_message({"role": "system", "content": str(self.system)})
+        self.tools = tools if isinstance(tools, ToolRegistry) else ToolRegistry(tools)
+        # Native tool-calling sends the tools' JSON schemas and reads structured tool calls back. With None it
+        # is used when the local model supports it, looked up on the first request, the ReAct text format
+        # remains the fallback.
+        self.native_tools = native_tools
+
+    def use_native_tools(self) -> bool:
+        if self.native_tools is None:
+            return bool(self.tools) and self.router is None and self.local and supports_tools(self.model)
+        return self.native_tools
+
+    @property
+    def messages(self):
+        """The messages sent to the model: system prompt, summary of older turns and recent turns."""
+        self.refresh_system()
+        return self.memory.context()
+
+    def refresh_system(self):
+        """Swaps in the new system prompt when a Preamble was re-rendered (once a day at most)."""
+        if self.memory.system is not None and self.memory.system["content"] != str(self.system):
+            self.memory.system = {"role": "system", "content": str(self.system)}
+
     def add_message(self, message):
-        self.messages.append(message)
-        logging.info(f"NEW MESSAGE: {self.messages[-1]}\n\n")
+        self.memory.add(message)
+        logging.info("NEW MESSAGE: %s\n\n", Preview(message))
+
+    def reset(self):
+        """Starts a fresh conversation, keeping only the system prompt."""
+        self.memory.reset()
 
     def serialize_messages(self):
         history = ""
@@ -75,90 +131,276 @@ class Agent:
         }
 
     def parse_action(self, message):
-        regex = re.compile(r'Action\s*:\s*(\w+)\s*:\s*(.*)')
-        action = regex.search(message)
-        if action:
-            action_name, action_args = action.group(1), action.group(2)
-            return action_name, action_args
-        return None, None
+        step = parse_step(message)
+        return step.action, step.args
 
     def parse_answer(self, message):
-        regex = re.compile(r'Answer\s*:\s*([\s\S]*)')
-        answer = regex.search(message)
-        if answer:
-            return answer.group(1)
+        return parse_step(message).answer
+
+    def final_answer(self, step, content):
+        """
+        The answer of a response without tool calls, None when the model has to be asked again. With native
+        tool-calling any text reply without an Action is the answer, the ReAct format needs an `Answer:`.
+        """
+        if step.answer:
+            return step.answer
+        if self.use_native_tools() and step.action is None and content.strip():
+            return content.strip()
         return None
 
+    def shape_observation(self, tool_result, question):
+        """Keeps only the passages of scraped pages relevant to the question, within `observation_budget` tokens."""
+        if self.observation_budget and isinstance(tool_result, dict) and all(isinstance(text, str) for text in tool_result.values()):
+            tool_result = compress_pages(tool_result, question, budget_tokens=self.observation_budget)
+        return str(tool_result)
+
     def __call__(self, message):
         return self.query(message)
 
+    def get_client(self):
+        if self.client is None:
+            from openai import OpenAI
+            self.client = OpenAI(base_url=OPENROUTER_URL, api_key=load_api_key())
+        return self.client
+
     def chat(self):
+        with tracer.span("chat", model=self.model, local=self.local) as span:
+            response = self.complete()
+            if span.sampled:
+                span.set(
+                    tokens_sent=sum(count_tokens(message["content"]) for message in self.messages),
+                    tokens_received=count_tokens(response["content"] or ""),
+                    **self.usage,
+                )
+            return response
+
+    def complete(self):
+        if self.router is not None:
+            response = self.router.complete(self.messages, stop=["PAUSE", "Observation:"])
+            return self.format_message(role=response["role"], content=response["content"] or "")
         if self.local:
+            import ollama
             response = ollama.chat(
                 model=self.model,
                 messages=self.messages,
                 stream=False,
-                options={""
-                         "stop": ["PAUSE", "Observation:"],
-                         },
-
+                options={**self.options, "stop": ["PAUSE", "Observation:"]},
+                keep_alive=self.keep_alive,
+                **({"tools": self.tools.schemas()} if self.use_native_tools() else {}),
             )
-            return self.format_message(role=response["message"].role, content=response["message"].content)
+            # Prompt tokens actually evaluated, i.e. not served from the backend's prompt cache.
+            self.usage = {
+                key: response.get(key) for key in ("prompt_eval_count", "prompt_eval_duration") if response.get(key) is not None
+            }
+            message = self.format_message(role=response["message"].role, content=response["message"].content or "")
+            tool_calls = getattr(response["message"], "tool_calls", None)
+            if tool_calls:
+                message["tool_calls"] = [
+                    {"function": {"name": call.function.name, "arguments": dict(call.function.arguments)}} for call in tool_calls
+                ]
+            return message
         else:
-            response = self.client.chat.completions.create(
+            response = self.get_client().chat.completions.create(
                 model=self.model,
                 messages=self.messages,
-                stop=["\nPAUSE\n", "PAUSE", "\nPAUSE", "PAUSE\n", "Observation"]
+                stop=["\nPAUSE\n", "PAUSE", "\nPAUSE", "PAUSE\n", "Observation"],
+                **({"tools": self.tools.schemas()} if self.use_native_tools() else {}),
             )
-            return self.format_message(response.choices[0].message.role, response.choices[0].message.content)
+            choice = response.choices[0].message
+            message = self.format_message(choice.role, choice.content or "")
+            if choice.tool_calls:
+                message["tool_calls"] = [
+                    {"id": call.id, "type": "function", "function": {"name": call.function.name, "arguments": call.function.arguments}}
+                    for call in choice.tool_calls
+                ]
+            return message
+
+    async def astream(self):
+        if self.router is not None:
+            import asyncio
+            # The router races blocking clients in its own threads, the answer comes back whole.
+            yield (await asyncio.to_thread(self.complete))["content"] or ""
+            return
+        if self.async_client is None:
+            if self.local:
+                import ollama
+                self.async_client = ollama.AsyncClient()
+            else:
+                from openai import AsyncOpenAI
+                self.async_client = AsyncOpenAI(base_url=OPENROUTER_URL, api_key=load_api_key())
+        if self.local:
+            stream = await self.async_client.chat(
+                model=self.model,
+                messages=self.messages,
+                stream=True,
+                options={**self.options, "stop": ["PAUSE", "Observation:"]},
+                keep_alive=self.keep_alive,
+            )
+            try:
+                async for chunk in stream:
+                    yield chunk["message"].content or ""
+            finally:
+                await stream.aclose()
+        else:
+            stream = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=self.messages,
+                stop=["\nPAUSE\n", "PAUSE", "\nPAUSE", "PAUSE\n", "Observation"],
+                stream=True,
+            )
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                await stream.close()
+
+    async def achat(self, on_token=None):
+        """
+        Streams the completion and returns as soon as a complete Action line has been generated,
+        without waiting for the model to reach the stop sequence. Timings are appended to `metrics`.
+        """
+        started = time.perf_counter()
+        first_token = None
+        content = ""
+        tokens = self.astream()
+        try:
+            async for token in tokens:
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                content += token
+                if on_token:
+                    on_token(token)
+                if "\n" in token:
+                    step = parse_step(content)
+                    if step.action and step.args is not None and not step.repaired:
+                        break
+        finally:
+            await tokens.aclose()
+        self.metrics.append({"time_to_first_token": first_token, "model_time": time.perf_counter() - started})
+        return self.format_message(role="assistant", content=content)
 
     def run(self):
         response = self.chat()
         self.add_message(response)
         return self.parse_answer(response["content"])
 
-    def query(self, question, max_try=10):
+    def call_tool(self, action_name, action_args, question) -> str:
+        try:
+            tool_result = self.tools.call(action_name, action_args)
+        except InvalidArguments as e:
+            # Tells the model what to fix instead of a bare failure.
+            logging.info(f"Invalid call of {action_name}: {e}")
+            return str(e)
+        except Exception as e:
+            logging.info(f"An error has beed raised while calling {action_name}.")
+            return f"An error has beed raised while calling {action_name}, no observations are available."
+        if isinstance(tool_result, dict) and all(isinstance(text, str) for text in tool_result.values()):
+            self.sources.extend(url for url, text in tool_result.items() if text and url not in self.sources)
+        return self.shape_observation(tool_result, question)
+
+    def run_action(self, action_name, action_args, question):
+        return self.format_message(role="assistant", content="Observation: " + self.call_tool(action_name, action_args, question))
+
+    def run_tool_calls(self, tool_calls, question) -> list:
+        """Runs the native tool calls of a response, one `tool` message per call."""
+        messages = []
+        for call in tool_calls:
+            name = call["function"]["name"]
+            message = self.format_message(role="tool", content=self.call_tool(name, call["function"]["arguments"], question))
+            if "id" in call:
+                message["tool_call_id"] = call["id"]
+            else:
+                message["tool_name"] = name
+            messages.append(message)
+        return messages
+
+    def query(self, question, max_try=10, reset=False):
+        with tracer.span("query", model=self.model):
+            return self._query(question, max_try, reset)
+
+    def _query(self, question, max_try, reset):
+        if reset:
+            self.reset()
+        self.sources = []
         self.add_message(self.format_message(role="user", content=f"Question : {question}"))
         it = 0
         while it < max_try:
             response = self.chat()
             self.add_message(response)
-            action_name, action_args = self.parse_action(response["content"])
-            answer = self.parse_answer(response["content"])
-            if answer:
+            if response.get("tool_calls"):
+                for message in self.run_tool_calls(response["tool_calls"], question):
+                    self.add_message(message)
+                it+=1
+                continue
+            step = parse_step(response["content"])
+            if answer := self.final_answer(step, response["content"]):
                 return answer
-            elif action_name:
-                try:
-                    tool_result = self.tools[action_name](**ast.literal_eval(action_args))
-                except Exception as e:
-                    logging.info(f"An error has beed raised while calling {action_name}.")
-                    tool_result = f"An error has beed raised while calling {action_name}, no observations are available."
-                self.add_message(self.format_message(role="assistant", content="Observation: " + str(tool_result)))
+            elif step.action and step.args is not None:
+                self.add_message(self.run_action(step.action, step.args, question))
             else:
-                self.add_message(self.format_message(role="user", content="You incorrectly followed the process, resulting to no answer. Watch again how the process works and redo the 'Thought' step."))
+                self.add_message(self.format_message(role="user", content=RETRY_MESSAGE))
             #print(serialize_messages(self.messages))
             it+=1
         return "I was unable to process the query."
 
-def calculate(expression: str):
-    return ast.literal_eval(expression)
-
-ddg = DDGS()
+    async def aquery(self, question, max_try=10, reset=False, on_token=None):
+        """Async `query`: many agents can answer concurrently on one event loop, tools run in worker threads."""
+        with tracer.span("query", model=self.model):
+            return await self._aquery(question, max_try, reset, on_token)
 
-def ddg_search(query: str, max_results=3):
-    return ddg.text(query, max_results=max_results)
+    async def _aquery(self, question, max_try, reset, on_token):
+        import asyncio
+        if reset:
+            self.reset()
+        self.sources = []
+        self.add_message(self.format_message(role="user", content=f"Question : {question}"))
+        it = 0
+        while it < max_try:
+            step_started = time.perf_counter()
+            if self.use_native_tools():
+                # Tool calls come back whole, so there is nothing to gain from streaming.
+                response = await asyncio.to_thread(self.chat)
+                self.metrics.append({"time_to_first_token": None, "model_time": time.perf_counter() - step_started})
+            else:
+                response = await self.achat(on_token=on_token)
+            self.add_message(response)
+            if response.get("tool_calls"):
+                tool_started = time.perf_counter()
+                for message in await asyncio.to_thread(self.run_tool_calls, response["tool_calls"], question):
+                    self.add_message(message)
+                self.metrics[-1]["tool_time"] = time.perf_counter() - tool_started
+                self.metrics[-1]["step_time"] = time.perf_counter() - step_started
+                it+=1
+                continue
+            step = parse_step(response["content"])
+            if answer := self.final_answer(step, response["content"]):
+                self.metrics[-1]["step_time"] = time.perf_counter() - step_started
+                return answer
+            elif step.action and step.args is not None:
+                tool_started = time.perf_counter()
+                # to_thread copies the context, so the tool spans stay in this query's trace.
+                self.add_message(await asyncio.to_thread(self.run_action, step.action, step.args, question))
+                self.metrics[-1]["tool_time"] = time.perf_counter() - tool_started
+            else:
+                self.add_message(self.format_message(role="user", content=RETRY_MESSAGE))
+            self.metrics[-1]["step_time"] = time.perf_counter() - step_started
+            it+=1
+        return "I was unable to process the query."
 
-def scrape_website(url: str):
-    if not url:
-        raise ValueError("The URL is missing.")
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    html = requests.get(url, headers=headers).text
-    return BeautifulSoup(html, parser="lxml", features="lxml")
+@Tool.pure
+def calculate(expression: str):
+    """Evaluates a Python literal expression and returns its value."""
+    return ast.literal_eval(expression)
 
-def extract_text(soup):
-    for tag in soup(["script", "style", "header", "footer", "nav", "aside"]):
-        tag.decompose()
-    return soup.get_text(separator='\n', strip=True)
+@Tool
+def local_search(query: str, max_results: int = 5) -> dict:
+    """
+    Searches the pages already read in earlier sessions, without going on the web.
+    Returns a dict {url: passages}, empty when nothing relevant was read before.
+    Try it first, and use search_tool when the passages do not answer the question.
+    """
+    return search_local_index(query, max_results=max_results)
 
 @Tool
 def search_tool(query: str, max_results: int = 3) -> list:
@@ -173,22 +415,21 @@ def search_tool(query: str, max_results: int = 3) -> list:
     return urls
 
 @Tool
-def parse_tool(urls: list[str]) -> str:
+def parse_tool(urls: list[str]) -> dict:
     """
     A website parser.
-    Takes a list of URLs (strings), scrapes them, and returns the full text content.
+    Takes a list of URLs (strings), scrapes them, and returns a dict {url: text} with the most relevant passages.
     Always use it when you found a relevant link with the search_tool.
     Reminder: Never output Answer without using this tool.
     """
-    soups = [scrape_website(url) for url in urls]
-    texts = {url: extract_text(soup) for url, soup in zip(urls, soups)}
-    return str(texts)
+    return scrape_websites(urls)
 
-tools = {
+tools = ToolRegistry({
     "calculate": calculate,
+    "local_search": local_search,
     "search_tool": search_tool,
     "parse_tool": parse_tool
-}
+})
 
 def serialize_messages(messages):
     history = ""
@@ -205,7 +446,7 @@ def search_agent(agent):
         agent(human_message)
         print("\n")
 
-system = f"""
+SYSTEM_TEMPLATE = """
 You are an **Exhaustive Research Agent**. Your mandate is to answer the user's **original query** with absolute factual accuracy by systematically breaking it down, gathering evidence, and cross-referencing sources.
 
 # IMPORTANT — ENFORCEMENT: ACTION PRODUCTION (READ THIS FIRST)
@@ -228,8 +469,9 @@ PAUSE
 - If a previous assistant message from the agent was empty, **do not** loop by printing the same Thought again; instead produce a different Action (choose the best next tool and arguments) or use `Action: no_action: {{}}` and `PAUSE`.
 
 # TOOLS AVAILABLE
-1. `search_tool(query)`: {search_tool.spec()}
-2. `parse_tool(url)`: {parse_tool.spec()}
+1. `local_search(query)`: {local_search}
+2. `search_tool(query)`: {search_tool}
+3. `parse_tool(url)`: {parse_tool}
 
 # OPERATIONAL PROTOCOL
 1. **Deconstruct & Plan:**
@@ -238,7 +480,7 @@ PAUSE
  - Formulate a step-by-step research plan.
 
 2. **Iterative Execution (The Loop):**
- - For *each* sub-question, execute `search_tool`.
+ - For *each* sub-question, first execute `local_search`. If its passages do not answer the sub-question, execute `search_tool`.
  - **CRITICAL:** If search snippets are too short, vague, or missing details, you **MUST** use `parse_tool` on high-quality URLs to read the full content.
  - **Recovery Strategy:** If a search yields poor results, you **MUST** revise your query (use synonyms, specific domain terms, or boolean operators) and search again. Do not stop until the specific data point is found or exhaustively proven unavailable.
 
@@ -276,10 +518,20 @@ PAUSE
 3. **Citations:** The final `Answer` must contain inline citations (e.g., `[Source](url)`). Do not hallucinate URLs.
 4. **Efficiency:** Avoid redundant searches. If a source provides the answer, move to the next sub-question.
 5. **No Fluff:** Keep "Thoughts" analytical and concise. Keep the "Answer" professional and dense with information.
-6. **Current Context:** Today is {datetime.now()}. Adjust relative time queries (e.g., "last month", "current CEO") accordingly.
+6. **Current Context:** Today is {day}. Adjust relative time queries (e.g., "last month", "current CEO") accordingly.
 """.strip()
 
-agent = Agent("qwen3:30b", system, tools)
-print(agent("C'est quoi la météo du jour à Angers ?"))
-#print(agent.messages)
+# Rendered once a day: the prompt prefix stays identical across turns and sessions.
+system = Preamble(lambda day: SYSTEM_TEMPLATE.format(
+    day=day.isoformat(), local_search=local_search.spec(), search_tool=search_tool.spec(), parse_tool=parse_tool.spec()
+))
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    agent = Agent("qwen3:30b", system, tools)
+    print(agent("C'est quoi la météo du jour à Angers ?"))
+    #print(agent.messages)
+
+if __name__ == "__main__":
+    main()
 
@@ -3,36 +3,27 @@ from langchain.tools import tool
 from typing import TypedDict, Annotated
 import operator
 from langchain_core.messages import AnyMessage, SystemMessage, HumanMessage, ToolMessage, AIMessageChunk
-from langchain_ollama import ChatOllama
-from langgraph.checkpoint.memory import MemorySaver
+from checkpoint_store import SQLiteCheckpointStore
 import logging
-import requests
-from ddgs import DDGS
-from bs4 import BeautifulSoup
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+from web import ddg_search, scrape_websites, search_local_index
+from tracing import tracer, Preview, payload_size
+from prompts import Preamble
 import uuid
+import contextvars
 
 #logging.basicConfig(level=logging.INFO)
 
-API_KEY_PATH = "../api_keys/openrouter.txt"
-API_KEY = open(API_KEY_PATH, "r").readline()
+CHECKPOINT_PATH = "../cache/checkpoints.sqlite"
 
-ddg = DDGS()
-
-def ddg_search(query: str, max_results=3):
-    return ddg.text(query, max_results=max_results)
-
-def scrape_website(url: str):
-    if not url:
-        raise ValueError("The URL is missing.")
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    html = requests.get(url, headers=headers).text
-    return BeautifulSoup(html, parser="lxml", features="lxml")
-
-def extract_text(soup):
-    for tag in soup(["script", "style", "header", "footer", "nav", "aside"]):
-        tag.decompose()
-    return soup.get_text(separator='\n', strip=True)
+@tool
+def local_search(query: str, max_results: int = 5):
+    """
+    Searches the pages already read in earlier sessions, without going on the web.
+    Returns a dict {url: passages}, empty when nothing relevant was read before.
+    Try it first, and use search_tool when the passages do not answer the question.
+    """
+    return str(search_local_index(query, max_results=max_results))
 
 @tool
 def search_tool(query: str, max_results: int = 3):
@@ -52,18 +43,26 @@ def parse_tool(urls: list[str]):
     Takes a list of URLs (strings), scrapes them, and returns the full text content.
     Use this only on URLs that looked relevant in the search step.
     """
-    soups = [scrape_website(url) for url in urls]
-    texts = {url: extract_text(soup) for url, soup in zip(urls, soups)}
+    texts = scrape_websites(urls)
     return str(texts)
 
 class AgentState(TypedDict):
     messages: Annotated[list[AnyMessage], operator.add]
 
 class Agent:
-    def __init__(self, model, tools, checkpointer, system=""):
+    """
+    ReAct agent as a LangGraph graph. The tool calls of one step run concurrently on up to
+    `max_parallel_tools` threads, and `tool_timeout` (seconds) bounds the whole step, not each call:
+    the calls still running then are answered with a timeout message.
+    """
+    def __init__(self, model, tools, checkpointer, system="", max_parallel_tools=4, tool_timeout=60.0):
         self.model = model.bind_tools(tools)
         self.system = system
+        self.system_message = SystemMessage(content=str(system)) if system else None
         self.tools = {t.name: t for t in tools}
+        self.tool_timeout = tool_timeout
+        self.max_parallel_tools = max_parallel_tools
+        self.executor = ThreadPoolExecutor(max_workers=max_parallel_tools, thread_name_prefix="tools")
         graph = StateGraph(AgentState)
         graph.add_node("llm", self.call_ollama)
         graph.add_node("action", self.take_action)
@@ -78,18 +77,54 @@ class Agent:
 
     def call_ollama(self, state: AgentState):
         messages = state["messages"]
-        if self.system:
-            messages = [SystemMessage(content=self.system)] + messages
-        message = self.model.invoke(messages)
+        if self.system_message is not None:
+            # The same system message is reused until the Preamble is re-rendered, once a day at most.
+            if self.system_message.content != str(self.system):
+                self.system_message = SystemMessage(content=str(self.system))
+            messages = [self.system_message] + messages
+        with tracer.span("chat", messages=len(messages)) as span:
+            message = self.model.invoke(messages)
+            if span.sampled:
+                # Prompt tokens actually evaluated, i.e. not served from the backend's prompt cache.
+                usage = {key: message.response_metadata.get(key) for key in ("prompt_eval_count", "prompt_eval_duration")}
+                span.set(tool_calls=len(message.tool_calls), **{key: value for key, value in usage.items() if value is not None})
         return {"messages": [message]}
 
+    def run_tool(self, tool):
+        logging.info("Calling %s", Preview(tool))
+        with tracer.span("tool", tool=tool["name"]) as span:
+            result = self.tools[tool["name"]].invoke(tool["args"])
+            if span.sampled:
+                span.set(payload_chars=payload_size(result))
+            return result
+
     def take_action(self, state: AgentState):
-        tool_calls = state["messages"][-1].tool_calls
+        with tracer.span("take_action") as span:
+            tool_calls = state["messages"][-1].tool_calls
+            span.set(tool_calls=len(tool_calls))
+            return self.run_tools(tool_calls)
+
+    def run_tools(self, tool_calls):
+        # Copying the context keeps the tool spans under the take_action span in the worker threads.
+        futures = [self.executor.submit(contextvars.copy_context().run, self.run_tool, tool) for tool in tool_calls]
+        _, not_done = wait(futures, timeout=self.tool_timeout)
+        if any(future.running() for future in not_done):
+            # A timed out call keeps its thread until it returns. Later steps get a new pool instead of queuing
+            # behind it, the old one winds down once its last call finishes.
+            logging.info(f"{len(not_done)} tool calls timed out, replacing the tool pool.")
+            self.executor = ThreadPoolExecutor(max_workers=self.max_parallel_tools, thread_name_prefix="tools")
         results = []
-        for tool in tool_calls:
-            logging.info(f"Calling {tool}")
-            result = self.tools[tool["name"]].invoke(tool["args"])
-            results.append(ToolMessage(tool_call_id=tool["id"], name=tool["name"], content=str(result)))
+        for tool, future in zip(tool_calls, futures):
+            if not future.done():
+                future.cancel()
+                logging.info(f"{tool['name']} did not finish within {self.tool_timeout}s.")
+                content = f"{tool['name']} did not finish within {self.tool_timeout}s, no observations are available."
+            elif future.exception() is not None:
+                logging.info(f"An error has been raised while calling {tool['name']}: {future.exception()}")
+                content = f"An error has been raised while calling {tool['name']}, no observations are available."
+            else:
+                content = str(future.result())
+            results.append(ToolMessage(tool_call_id=tool["id"], name=tool["name"], content=content))
         return {"messages": results}
 
     def action_exists(self, state: AgentState):
@@ -121,7 +156,7 @@ def search_agent(agent):
         except KeyboardInterrupt:
             break
 
-system = f"""
+SYSTEM_TEMPLATE = """
 # Rigorous Research Agent System Prompt with Persistent Search
 
 You are a **rigorous research agent**. Your **sole objective** is to answer the user’s **full original query**. Always remind yourself of the **original query** before executing any actions, and ensure your final answer directly addresses **every part** of it.
@@ -133,7 +168,8 @@ You are a **rigorous research agent**. Your **sole objective** is to answer the
 1. **Analyze:** Break the original query into discrete parts (e.g., Part A, Part B, etc.).  
 
 2. **Execute Part A (and others):**  
-   - Attempt to retrieve relevant information using `search_tool(query)`.  
+   - First look for the information in the pages read before using `local_search(query)`.  
+   - If the passages do not answer Part A, attempt to retrieve relevant information using `search_tool(query)`.  
    - If the first search yields incomplete or insufficient results:  
      1. **Generate alternative search keywords or phrasing** based on the original query.  
      2. **Loop back** and execute a new search using these alternative keywords.  
@@ -151,8 +187,9 @@ You are a **rigorous research agent**. Your **sole objective** is to answer the
 
 ## TOOLS
 
-1. `search_tool(query)` – Retrieve snippets from the web.  
-2. `parse_tool(url)` – Retrieve the full content of a specific page.
+1. `local_search(query)` – Retrieve passages of the pages read in earlier sessions.  
+2. `search_tool(query)` – Retrieve snippets from the web.  
+3. `parse_tool(url)` – Retrieve the full content of a specific page.
 
 ---
 
@@ -178,18 +215,28 @@ You are a **rigorous research agent**. Your **sole objective** is to answer the
 
 ## EXTRA INFORMATION
 
-- Current date and time: {datetime.now()}
+- Current date: {day}
 """
 
+# Rendered once a day: the prompt prefix stays identical across turns and sessions.
+system = Preamble(lambda day: SYSTEM_TEMPLATE.format(day=day.isoformat()))
+
 
-tools = [search_tool, parse_tool]
-memory = MemorySaver()
+tools = [local_search, search_tool, parse_tool]
 
-model = ChatOllama(model="qwen3:30b", temperature=0.5)
-agent = Agent(model=model, tools=tools, system=system, checkpointer=memory)
+def draw_graph(agent, path="react_agent_graph.png"):
+    dot_source = agent.graph.get_graph().draw_mermaid_png()
+    with open(path, "wb") as f:
+        f.write(dot_source)
 
-dot_source = agent.graph.get_graph().draw_mermaid_png()
-with open("react_agent_graph.png", "wb") as f:
-    f.write(dot_source)
+def main():
+    from langchain_ollama import ChatOllama
+    memory = SQLiteCheckpointStore(CHECKPOINT_PATH, max_idle=7 * 24 * 3600)
+    # keep_alive keeps the model, and its prompt cache, loaded between turns.
+    model = ChatOllama(model="qwen3:30b", temperature=0.5, keep_alive="30m", num_ctx=16384)
+    agent = Agent(model=model, tools=tools, system=system, checkpointer=memory)
+    draw_graph(agent)
+    search_agent(agent)
 
-search_agent(agent)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+from collections import namedtuple
+import json
+import ast
+import re
+
+Step = namedtuple("Step", ["thought", "action", "args", "answer", "repaired"])
+
+STEP_RE = re.compile(
+    # A thought ends at the line's end, or at an Action or Answer the model put on the same line.
+    r"Thought\s*:\s*(?P<thought>(?:[^\nA]+|A(?!ction\s*:|nswer\s*:))*)"
+    r"|Action\s*:\s*(?P<action>\w+)[ \t]*:?[ \t]*(?P<args>[^\n]*)"
+    r"|Answer\s*:\s*(?P<answer>[\s\S]*)"
+)
+STOP_RE = re.compile(r"PAUSE|Observation\s*:")
+JSON_LITERALS = {"true": "True", "false": "False", "null": "None"}
+CLOSERS = {"{": "}", "[": "]", "(": ")"}
+
+def balance(text: str):
+    """
+    Scans `text` from its first opening brace and returns the balanced literal, closing whatever
+    is still open at the end, and replacing JSON literals found outside of strings.
+    """
+    start = text.find("{")
+    if start == -1:
+        return None
+    out, stack, quote, escaped = [], [], None, False
+    i = start
+    while i < len(text):
+        char = text[i]
+        if quote:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+            out.append(char)
+        elif char in CLOSERS:
+            stack.append(CLOSERS[char])
+            out.append(char)
+        elif char in "}])":
+            if not stack or stack[-1] != char:
+                break
+            stack.pop()
+            out.append(char)
+            if not stack:
+                return "".join(out)
+        elif char.isalpha():
+            word = re.match(r"[A-Za-z_]\w*", text[i:]).group(0)
+            out.append(JSON_LITERALS.get(word, word))
+            i += len(word)
+            continue
+        else:
+            out.append(char)
+        i += 1
+    if quote:
+        out.append(quote)
+    return "".join(out) + "".join(reversed(stack))
+
+def literal_dict(text: str):
+    try:
+        args = ast.literal_eval(text)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+    return args if isinstance(args, dict) else None
+
+def json_dict(text: str):
+    try:
+        args = json.loads(text)
+    except ValueError:
+        return None
+    return args if isinstance(args, dict) else None
+
+def parse_args(line: str, rest: str = None):
+    """
+    Returns (args, repaired) for the Action arguments found on `line`, `rest` being the text up to the
+    next PAUSE in case the dict spans several lines. args is None if they cannot be recovered.
+    """
+    line = line.strip()
+    rest = rest.strip() if rest else line
+    if not line and not rest:
+        return {}, False
+    args = literal_dict(line)
+    if args is not None:
+        return args, False
+    for candidate in (json_dict(line), literal_dict(rest), json_dict(rest)):
+        if candidate is not None:
+            return candidate, True
+    for text in (rest, line):
+        candidate = balance(text)
+        if candidate is not None and literal_dict(candidate) is not None:
+            return literal_dict(candidate), True
+    return None, False
+
+def parse_step(message: str) -> Step:
+    """
+    Parses a ReAct response in one pass. An Answer wins over an Action, like in Agent.query.
+    `args` is None when the Action arguments could not be repaired.
+    """
+    thought = action = args_text = args_start = answer = None
+    for match in STEP_RE.finditer(message):
+        kind = match.lastgroup
+        if kind == "thought" and thought is None:
+            thought = match.group("thought").strip()
+        elif kind == "args" and action is None:
+            action, args_text, args_start = match.group("action"), match.group("args"), match.start("args")
+        elif kind == "answer":
+            answer = match.group("answer")
+            break
+    if answer is not None or action is None:
+        return Step(thought, None, None, answer, False)
+    rest = STOP_RE.split(message[args_start:], maxsplit=1)[0]
+    args, repaired = parse_args(args_text, rest)
+    return Step(thought, action, args, None, repaired)
@@ -0,0 +1,232 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque
+from tracing import tracer
+import contextvars
+import threading
+import logging
+import random
+import math
+import time
+
+class ModelUnavailable(Exception):
+    pass
+
+class Backend:
+    """
+    One model on one endpoint, with its health and latency statistics.
+    `complete(messages, stop) -> {"role", "content"}` does the actual request. After `failure_threshold`
+    consecutive failures the circuit opens: the backend is skipped for `cooldown` seconds, then a
+    single trial request decides whether it closes again.
+    """
+    def __init__(self, name, complete, alpha=0.2, failure_threshold=3, cooldown=30.0, window=100):
+        self.name = name
+        self.complete = complete
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.ewma = None
+        self.latencies = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def acquire(self) -> bool:
+        """Whether a request may be sent now, a half-open backend lets a single trial through."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self, latency):
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._trial = False
+            self.latencies.append(latency)
+            self.ewma = latency if self.ewma is None else self.alpha * latency + (1 - self.alpha) * self.ewma
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self._trial or self.consecutive_failures >= self.failure_threshold:
+                if self.opened_at is None or self._trial:
+                    logging.info(f"Circuit of backend {self.name} opened after {self.consecutive_failures} failures.")
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+    def percentile(self, q):
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "ewma": self.ewma,
+            "p95": self.percentile(0.95),
+            "successes": self.successes,
+            "failures": self.failures,
+        }
+
+def ollama_backend(model, host=None, options=None, keep_alive=None, timeout=120.0, name=None, **kwargs):
+    """A Backend calling `model` on the Ollama server at `host` (the default local one if None)."""
+    import ollama
+    client = ollama.Client(host=host, timeout=timeout)
+
+    def complete(messages, stop=None):
+        response = client.chat(
+            model=model, messages=messages, options={**(options or {}), **({"stop": stop} if stop else {})}, keep_alive=keep_alive
+        )
+        return {"role": response["message"].role, "content": response["message"].content or ""}
+    return Backend(name or f"ollama:{host or 'local'}:{model}", complete, **kwargs)
+
+def openai_backend(model, base_url, api_key, timeout=120.0, name=None, **kwargs):
+    """A Backend calling `model` on an OpenAI compatible endpoint, e.g. OpenRouter."""
+    from openai import OpenAI
+    client = OpenAI(base_url=base_url, api_key=api_key, timeout=timeout, max_retries=0)
+
+    def complete(messages, stop=None):
+        response = client.chat.completions.create(model=model, messages=messages, stop=stop)
+        return {"role": response.choices[0].message.role, "content": response.choices[0].message.content or ""}
+    return Backend(name or f"openai:{model}", complete, **kwargs)
+
+class ModelRouter:
+    """
+    Sends each completion to the healthy backend with the lowest latency (EWMA), backends never
+    measured yet are tried first, and an `explore` share of the requests goes to another backend so
+    that a backend slowed down once gets measured again. A failed request falls through to the next backend.
+    With `hedge_percentile` (e.g. 0.95), a duplicate request goes to the next backend once the first
+    one has run longer than that percentile of its recent latencies, and the first answer wins.
+    A percentile is only trusted with `min_samples` latencies above it, e.g. 100 samples for p95: until
+    a backend has that many, the latencies of all backends are used.
+    """
+    def __init__(self, backends, hedge_percentile=None, min_samples=5, timeout=120.0, explore=0.05, max_workers=8):
+        self.backends = list(backends)
+        self.explore = explore
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="router")
+        self.counters = {"requests": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0, "unavailable": 0}
+        self.latencies = deque(maxlen=max((backend.latencies.maxlen for backend in self.backends), default=100))
+        self._lock = threading.Lock()
+
+    def ranked(self) -> list:
+        ranked = sorted(self.backends, key=lambda backend: backend.ewma or 0.0)
+        if len(ranked) > 1 and random.random() < self.explore:
+            ranked.insert(0, ranked.pop(random.randrange(1, len(ranked))))
+        return ranked
+
+    def _call(self, backend, messages, stop):
+        started = time.perf_counter()
+        try:
+            response = backend.complete(messages, stop)
+        except Exception:
+            backend.record_failure()
+            raise
+        latency = time.perf_counter() - started
+        backend.record_success(latency)
+        with self._lock:
+            self.latencies.append(latency)
+        return response
+
+    def _hedge_delay(self, backend):
+        if self.hedge_percentile is None:
+            return None
+        # With fewer samples, a single slow request in the window would be the percentile itself.
+        needed = math.ceil(self.min_samples / (1 - self.hedge_percentile))
+        if len(backend.latencies) >= min(needed, backend.latencies.maxlen):
+            return backend.percentile(self.hedge_percentile)
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if len(latencies) < min(needed, self.latencies.maxlen):
+            return None
+        return latencies[min(len(latencies) - 1, int(self.hedge_percentile * len(latencies)))]
+
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def complete(self, messages, stop=None) -> dict:
+        with tracer.span("route") as span:
+            response, backend, attempts = self._complete(messages, stop)
+            span.set(backend=backend.name, attempts=attempts)
+            return response
+
+    def _complete(self, messages, stop):
+        self._count("requests")
+        candidates = iter(self.ranked())
+        deadline = time.monotonic() + self.timeout
+        pending, errors = {}, []
+        attempts, hedge = 0, None
+
+        def launch():
+            nonlocal attempts
+            for backend in candidates:
+                if backend.acquire():
+                    attempts += 1
+                    future = self.executor.submit(contextvars.copy_context().run, self._call, backend, messages, stop)
+                    pending[future] = (backend, time.monotonic())
+                    return backend
+            return None
+
+        if launch() is None:
+            self._count("unavailable")
+            raise ModelUnavailable("Every backend is circuit-broken.")
+        hedge_tried = False
+        while pending and time.monotonic() < deadline:
+            timeout = deadline - time.monotonic()
+            if not hedge_tried and len(pending) == 1:
+                (primary, sent_at), = pending.values()
+                delay = self._hedge_delay(primary)
+                if delay is not None:
+                    timeout = min(timeout, max(0.0, sent_at + delay - time.monotonic()))
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if not hedge_tried and len(pending) == 1:
+                    # The request is slower than usual for its backend, race a duplicate against it.
+                    hedge_tried = True
+                    hedge = launch()
+                    if hedge is not None:
+                        self._count("hedged")
+                continue
+            for future in done:
+                backend, _ = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    logging.info(f"Backend {backend.name} failed: {e!r}")
+                    errors.append(f"{backend.name}: {e!r}")
+                    continue
+                if backend is hedge:
+                    self._count("hedge_wins")
+                return response, backend, attempts
+            if not pending:
+                if launch() is None:
+                    break
+                self._count("failovers")
+        self._count("unavailable")
+        raise ModelUnavailable(f"No backend answered within {self.timeout}s: {errors}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        return {**counters, "backends": [backend.stats() for backend in self.backends]}
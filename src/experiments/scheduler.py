@@ -0,0 +1,84 @@
+from collections import OrderedDict, deque
+import contextvars
+import threading
+import time
+
+# Session on whose behalf the current thread calls the model backend.
+current_session = contextvars.ContextVar("current_session", default="default")
+
+class Overloaded(Exception):
+    pass
+
+class BackendScheduler:
+    """
+    Caps the number of model requests in flight across all sessions.
+    Waiting requests are queued per session and granted round-robin, so one busy session cannot
+    starve the others. Once `max_queue` requests are waiting, new ones fail fast with Overloaded.
+    """
+    def __init__(self, max_in_flight=4, max_queue=64, window=60.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.window = window
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self._queues = OrderedDict()
+        self._queued = 0
+        self._finished_at = deque()
+        self._condition = threading.Condition()
+
+    def run(self, func, *args, session=None, **kwargs):
+        """Calls `func` once a backend slot is granted to `session` (the current session by default)."""
+        self.acquire(session or current_session.get())
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.release()
+
+    def acquire(self, session):
+        ticket = {"granted": False}
+        with self._condition:
+            if self._queued >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded(f"{self._queued} requests are already waiting for the backend.")
+            self._queues.setdefault(session, deque()).append(ticket)
+            self._queued += 1
+            self._dispatch()
+            while not ticket["granted"]:
+                self._condition.wait()
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self.completed += 1
+            self._finished_at.append(time.monotonic())
+            self._dispatch()
+
+    def _dispatch(self):
+        granted = False
+        while self.in_flight < self.max_in_flight and self._queues:
+            session, queue = next(iter(self._queues.items()))
+            queue.popleft()["granted"] = True
+            self._queued -= 1
+            self.in_flight += 1
+            granted = True
+            # Move the session to the back so the next grant goes to another one.
+            del self._queues[session]
+            if queue:
+                self._queues[session] = queue
+        if granted:
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        with self._condition:
+            now = time.monotonic()
+            while self._finished_at and now - self._finished_at[0] > self.window:
+                self._finished_at.popleft()
+            return {
+                "queue_depth": self._queued,
+                "waiting_sessions": len(self._queues),
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "throughput_per_second": len(self._finished_at) / self.window,
+            }
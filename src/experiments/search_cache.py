@@ -0,0 +1,72 @@
+from concurrent.futures import Future
+from collections import OrderedDict, namedtuple
+import threading
+import time
+import re
+
+Entry = namedtuple("Entry", ["max_results", "results", "stored_at"])
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().casefold()
+
+class SearchCache:
+    """
+    Memoizes `search(query, max_results=...)` by normalized query.
+    An entry fetched with a larger `max_results` also answers smaller requests, entries expire after
+    `ttl` seconds, the least recently used are dropped past `max_entries`, and identical searches
+    already in flight wait for the running call instead of hitting the backend again.
+    """
+    def __init__(self, search, ttl=900.0, max_entries=512):
+        self.search = search
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0}
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, query: str, max_results=3):
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and self._is_fresh(entry) and entry.max_results >= max_results:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry.results[:max_results]
+            for (in_flight_key, in_flight_max), future in self._in_flight.items():
+                if in_flight_key == key and in_flight_max >= max_results:
+                    self.stats["coalesced"] += 1
+                    break
+            else:
+                future = None
+                self.stats["misses"] += 1
+                own_future = self._in_flight[(key, max_results)] = Future()
+
+        if future is not None:
+            return future.result()[:max_results]
+
+        try:
+            results = list(self.search(query, max_results=max_results))
+        except Exception as e:
+            with self._lock:
+                self._in_flight.pop((key, max_results), None)
+            own_future.set_exception(e)
+            raise
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.max_results <= max_results or not self._is_fresh(entry):
+                self._entries[key] = Entry(max_results, results, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._in_flight.pop((key, max_results), None)
+        own_future.set_result(results)
+        return results[:max_results]
+
+    def _is_fresh(self, entry):
+        return time.monotonic() - entry.stored_at <= self.ttl
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
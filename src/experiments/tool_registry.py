@@ -0,0 +1,193 @@
+from tracing import tracer, payload_size
+from functools import lru_cache
+import typing
+import inspect
+import types
+import json
+
+class InvalidArguments(ValueError):
+    pass
+
+JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", dict: "object", list: "array"}
+
+def _coerce_str(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise TypeError("expected a string")
+
+def _coerce_int(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        return int(value.strip())
+    raise TypeError("expected an integer")
+
+def _coerce_float(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        return float(value.strip())
+    raise TypeError("expected a number")
+
+def _coerce_bool(value):
+    if isinstance(value, bool):
+        return value
+    if value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        return value.strip().lower() == "true"
+    raise TypeError("expected a boolean")
+
+def _coerce_dict(value):
+    if isinstance(value, dict):
+        return value
+    raise TypeError("expected a dict")
+
+def _passthrough(value):
+    return value
+
+SCALARS = {str: _coerce_str, int: _coerce_int, float: _coerce_float, bool: _coerce_bool, dict: _coerce_dict}
+
+def compile_type(annotation):
+    """Returns (coerce, schema) for a type annotation, built once per tool parameter."""
+    origin, type_args = typing.get_origin(annotation), typing.get_args(annotation)
+    if annotation in SCALARS:
+        return SCALARS[annotation], {"type": JSON_TYPES[annotation]}
+    if annotation is list or origin is list:
+        item, item_schema = compile_type(type_args[0]) if type_args else (_passthrough, {})
+
+        def coerce_list(value):
+            # A single item is a common slip of the models, e.g. one url for parse_tool.
+            if not isinstance(value, (list, tuple)):
+                value = [value]
+            return [item(element) for element in value]
+        return coerce_list, {"type": "array", "items": item_schema} if item_schema else {"type": "array"}
+    if origin is dict:
+        return _coerce_dict, {"type": "object"}
+    if origin in (typing.Union, types.UnionType) and type(None) in type_args:
+        inner, schema = compile_type(next(arg for arg in type_args if arg is not type(None)))
+        return (lambda value: None if value is None else inner(value)), schema
+    return _passthrough, {}
+
+class Tool:
+    """
+    A function the model can call. Its signature is compiled once into per-parameter coercers, a JSON
+    schema for native tool-calling and the spec text of the ReAct prompt.
+    With `memoize`, results are kept in an LRU cache of `cache_size` entries: only for pure functions.
+    """
+    def __init__(self, func, memoize=False, cache_size=256):
+        self.func = func
+        self.name = func.__name__
+        self.memoize = memoize
+        self._cached = lru_cache(maxsize=cache_size)(func) if memoize else None
+        hints = typing.get_type_hints(func)
+        self.params = []
+        properties, required = {}, []
+        for name, param in inspect.signature(func).parameters.items():
+            coerce, schema = compile_type(hints.get(name, typing.Any))
+            self.params.append((name, coerce, param.default is inspect.Parameter.empty))
+            properties[name] = schema
+            if param.default is inspect.Parameter.empty:
+                required.append(name)
+        self.names = frozenset(name for name, _, _ in self.params)
+        self.schema = {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": inspect.cleandoc(func.__doc__ or ""),
+                "parameters": {"type": "object", "properties": properties, "required": required},
+            },
+        }
+        self._spec = (f"{{ "
+                      f"'name': '{func.__name__}',"
+                      f"'module': '{func.__module__}',"
+                      f"'annotations': '{func.__annotations__}',"
+                      f"'doc': '{func.__doc__}'"
+                      f"}}")
+
+    @classmethod
+    def pure(cls, func):
+        """Decorator for tools whose result only depends on their arguments, so it can be cached."""
+        return cls(func, memoize=True)
+
+    def spec(self):
+        return self._spec
+
+    def validate(self, args) -> dict:
+        """Checks `args` against the signature and coerces them to the annotated types."""
+        if not isinstance(args, dict):
+            raise InvalidArguments(f"{self.name} expects a dict of arguments, got {type(args).__name__}.")
+        unknown = args.keys() - self.names
+        if unknown:
+            raise InvalidArguments(f"{self.name} got unexpected arguments {sorted(unknown)}, expected {[name for name, _, _ in self.params]}.")
+        valid = {}
+        for name, coerce, required in self.params:
+            if name not in args:
+                if required:
+                    raise InvalidArguments(f"{self.name} is missing the argument '{name}'.")
+                continue
+            try:
+                valid[name] = coerce(args[name])
+            except (TypeError, ValueError) as e:
+                raise InvalidArguments(f"{self.name}: invalid value {args[name]!r} for '{name}' ({e}).") from None
+        return valid
+
+    def run(self, args: dict):
+        """Calls the function with already validated `args`, from the cache when memoized."""
+        if self._cached is not None:
+            try:
+                hash(tuple(args.values()))
+            except TypeError:
+                return self.func(**args)
+            return self._cached(**args)
+        return self.func(**args)
+
+    def cache_info(self):
+        return self._cached.cache_info() if self._cached is not None else None
+
+    def invoke(self, args: dict):
+        with tracer.span("tool", tool=self.name) as span:
+            result = self.run(self.validate(args))
+            if span.sampled:
+                span.set(payload_chars=payload_size(result))
+            return result
+
+    def __call__(self, *args, **kwargs):
+        kwargs.update(zip((name for name, _, _ in self.params), args))
+        return self.invoke(kwargs)
+
+class ToolRegistry:
+    """Tools by name, plain functions are wrapped in a Tool. `schemas()` is what native tool-calling sends."""
+    def __init__(self, tools: dict):
+        self.tools = {name: tool if isinstance(tool, Tool) else Tool(tool) for name, tool in tools.items()}
+        self._schemas = [tool.schema for tool in self.tools.values()]
+
+    def __getitem__(self, name) -> Tool:
+        return self.tools[name]
+
+    def __contains__(self, name):
+        return name in self.tools
+
+    def __iter__(self):
+        return iter(self.tools)
+
+    def __len__(self):
+        return len(self.tools)
+
+    def schemas(self) -> list:
+        return self._schemas
+
+    def call(self, name, args):
+        """Runs tool `name`. `args` may be a dict or a JSON string, as OpenAI sends them."""
+        if name not in self.tools:
+            raise InvalidArguments(f"There is no tool named {name}, available tools: {list(self.tools)}.")
+        if isinstance(args, str):
+            try:
+                args = json.loads(args) if args.strip() else {}
+            except ValueError:
+                raise InvalidArguments(f"The arguments of {name} are not valid JSON: {args!r}.") from None
+        return self.tools[name].invoke(args)
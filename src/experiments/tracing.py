@@ -0,0 +1,205 @@
+from contextlib import contextmanager
+from collections import deque
+from functools import wraps
+import contextvars
+import threading
+import logging
+import atexit
+import random
+import json
+import time
+import uuid
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+class Preview:
+    """Defers formatting of a large payload to when the log record is actually emitted, and truncates it."""
+    def __init__(self, payload, limit=500):
+        self.payload = payload
+        self.limit = limit
+
+    def __str__(self):
+        text = str(self.payload)
+        return text if len(text) <= self.limit else f"{text[:self.limit]}... [{len(text)} chars]"
+
+def payload_size(payload) -> int:
+    """Cheap size estimate (characters) of a tool result, without stringifying it."""
+    if isinstance(payload, str):
+        return len(payload)
+    if isinstance(payload, dict):
+        return sum(len(value) if isinstance(value, str) else 1 for value in payload.values())
+    if isinstance(payload, (list, tuple)):
+        return sum(payload_size(item) for item in payload)
+    return 1
+
+class Span:
+    sampled = True
+
+    def __init__(self, name, trace_id, parent_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.duration = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+class UnsampledSpan:
+    """Stands for every span of a trace that was not sampled, so instrumentation costs almost nothing."""
+    sampled = False
+
+    def set(self, **attributes):
+        pass
+
+UNSAMPLED = UnsampledSpan()
+
+class Tracer:
+    """
+    Records spans (name, duration, attributes, error) for the agent loop, tools and fetch stages.
+    A trace is sampled as a whole with probability `sample_rate` when its root span starts.
+    Finished spans are kept in memory (up to `max_spans`), optionally appended to a JSONL file,
+    and aggregated per span name for `prometheus()`. The file is written by a background thread,
+    every `flush_interval` seconds or once `flush_size` spans are waiting, never by the traced code.
+    """
+    def __init__(self, sample_rate=1.0, jsonl_path=None, max_spans=10_000, flush_interval=1.0, flush_size=256):
+        self.sample_rate = sample_rate
+        self.jsonl_path = jsonl_path
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.spans = deque(maxlen=max_spans)
+        self.totals = {}
+        self._lock = threading.Lock()
+        self._pending = []
+        self._writer = None
+        self._wake = threading.Event()
+        self._write_lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **attributes):
+        parent = _current_span.get()
+        if parent is None:
+            sampled = random.random() < self.sample_rate
+        else:
+            sampled = parent.sampled
+        if not sampled:
+            token = _current_span.set(UNSAMPLED)
+            try:
+                yield UNSAMPLED
+            finally:
+                _current_span.reset(token)
+            return
+
+        span = Span(name, parent.trace_id if parent else uuid.uuid4().hex, parent.span_id if parent else None, attributes)
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current_span.reset(token)
+            self._finish(span)
+
+    def traced(self, name=None):
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name or func.__name__):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _finish(self, span):
+        with self._lock:
+            self.spans.append(span)
+            totals = self.totals.setdefault(span.name, {"count": 0, "duration": 0.0, "errors": 0, "attributes": {}})
+            totals["count"] += 1
+            totals["duration"] += span.duration
+            totals["errors"] += span.error is not None
+            for key, value in span.attributes.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    totals["attributes"][key] = totals["attributes"].get(key, 0) + value
+            if self.jsonl_path:
+                self._pending.append(span)
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="tracer-writer", daemon=True)
+                    self._writer.start()
+                    atexit.register(self.flush)
+                if len(self._pending) >= self.flush_size:
+                    self._wake.set()
+
+    def _write_loop(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                logging.warning(f"Could not write the spans to {self.jsonl_path}: {e!r}")
+
+    def flush(self):
+        """Appends the finished spans still waiting to the JSONL file."""
+        with self._write_lock:
+            with self._lock:
+                spans, self._pending = self._pending, []
+                path = self.jsonl_path
+            if not spans or not path:
+                return
+            lines = "".join(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n" for span in spans)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+    def export_jsonl(self, path):
+        with self._lock:
+            spans = list(self.spans)
+        with open(path, "w", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+    def prometheus(self) -> str:
+        """Aggregated metrics in the Prometheus text exposition format."""
+        lines = [
+            "# TYPE agent_span_duration_seconds summary",
+            "# TYPE agent_span_errors_total counter",
+            "# TYPE agent_span_attribute_total counter",
+        ]
+        with self._lock:
+            for name, totals in sorted(self.totals.items()):
+                lines.append(f'agent_span_duration_seconds_count{{span="{name}"}} {totals["count"]}')
+                lines.append(f'agent_span_duration_seconds_sum{{span="{name}"}} {totals["duration"]:.6f}')
+                lines.append(f'agent_span_errors_total{{span="{name}"}} {totals["errors"]}')
+                for key, value in sorted(totals["attributes"].items()):
+                    lines.append(f'agent_span_attribute_total{{span="{name}",attribute="{key}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.totals = {}
+
+tracer = Tracer()
+
+def configure(sample_rate=1.0, jsonl_path=None, max_spans=10_000):
+    """Replaces the settings of the shared tracer used by the agents, tools and fetcher."""
+    tracer.sample_rate = sample_rate
+    tracer.jsonl_path = jsonl_path
+    tracer.spans = deque(tracer.spans, maxlen=max_spans)
+    return tracer
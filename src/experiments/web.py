@@ -0,0 +1,131 @@
+from functools import lru_cache, partial
+from tracing import tracer
+
+PAGE_CACHE_PATH = "../cache/pages.sqlite"
+LOCAL_INDEX_PATH = "../cache/index.sqlite"
+# Index the text of every fetched page so that later sessions can find it with search_local_index.
+LOCAL_INDEX = True
+# Parse pages while they download instead of building full BeautifulSoup trees.
+STREAMING_EXTRACTION = True
+# Characters of text kept per page in streaming mode, None keeps everything.
+TEXT_BUDGET = 200_000
+# Start downloading the top search results in the background, before the model asks to parse them.
+PREFETCH = False
+PREFETCH_TOP_N = 3
+PREFETCH_CONCURRENCY = 2
+PREFETCH_BYTES_PER_SECOND = 5_000_000
+
+# Clients are created on first use so that importing this module stays cheap.
+
+@lru_cache(maxsize=None)
+def get_ddg():
+    from ddgs import DDGS
+    return DDGS()
+
+@lru_cache(maxsize=None)
+def get_fetcher():
+    from fetcher import Fetcher
+    return Fetcher()
+
+@lru_cache(maxsize=None)
+def get_page_cache():
+    from page_cache import PageCache
+    return PageCache(PAGE_CACHE_PATH)
+
+@lru_cache(maxsize=None)
+def get_search_cache():
+    from search_cache import SearchCache
+    return SearchCache(ddg_text)
+
+@lru_cache(maxsize=None)
+def get_local_index():
+    from local_index import LocalIndex
+    return LocalIndex(LOCAL_INDEX_PATH)
+
+@lru_cache(maxsize=None)
+def get_prefetcher():
+    from fetcher import Fetcher
+    from prefetch import Prefetcher
+    fetcher = Fetcher(max_workers=PREFETCH_CONCURRENCY, per_host=1, max_bytes_per_second=PREFETCH_BYTES_PER_SECOND)
+    return Prefetcher(partial(prefetch_websites, fetcher=fetcher), max_concurrency=PREFETCH_CONCURRENCY)
+
+def ddg_text(query: str, max_results=3):
+    return get_ddg().text(query, max_results=max_results)
+
+def ddg_search(query: str, max_results=3):
+    with tracer.span("search", max_results=max_results) as span:
+        results = get_search_cache()(query, max_results=max_results)
+        span.set(results=len(results))
+        if PREFETCH and results:
+            get_prefetcher().speculate([result["href"] for result in results[:PREFETCH_TOP_N]])
+        return results
+
+def search_local_index(query: str, max_results=5) -> dict:
+    """{url: passages} of the indexed chunks that best match `query`, empty when nothing matches."""
+    with tracer.span("local_search", max_results=max_results) as span:
+        passages = {}
+        for hit in get_local_index().search(query, k=max_results):
+            passages.setdefault(hit.url, []).append(hit.text)
+        span.set(hits=sum(len(texts) for texts in passages.values()), pages=len(passages))
+        return {url: "\n[...]\n".join(texts) for url, texts in passages.items()}
+
+def make_soup(html):
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, parser="lxml", features="lxml")
+
+def scrape_website(url: str):
+    return make_soup(get_fetcher().fetch(url))
+
+def extract_text(soup):
+    for tag in soup(["script", "style", "header", "footer", "nav", "aside"]):
+        tag.decompose()
+    return soup.get_text(separator='\n', strip=True)
+
+def scrape_websites(urls: list[str]) -> dict:
+    with tracer.span("scrape", urls=len(urls)) as span:
+        texts = get_prefetcher().take(urls) if PREFETCH else {}
+        missing = [url for url in urls if url not in texts]
+        if missing:
+            texts.update(_scrape_websites(missing, span))
+        texts = {url: texts[url] for url in urls if url in texts}
+        span.set(prefetched=len(urls) - len(missing), pages=len(texts), text_chars=sum(len(text) for text in texts.values()))
+        return texts
+
+def prefetch_websites(urls: list[str], fetcher) -> dict:
+    """Speculative `scrape_websites` run in the background by the prefetcher, with its own throttled fetcher."""
+    with tracer.span("prefetch", urls=len(urls)) as span:
+        return _scrape_websites(urls, span, fetcher)
+
+def _scrape_websites(urls, span, fetcher=None):
+    page_cache = get_page_cache()
+    texts = {}
+    for url in urls:
+        text = page_cache.get(url)
+        if text is not None:
+            texts[url] = text
+
+    missing = [url for url in urls if url not in texts]
+    span.set(cache_hits=len(texts), cache_misses=len(missing))
+    validators = {url: page_cache.validators(url) for url in missing}
+    if STREAMING_EXTRACTION:
+        from extractor import TextExtractor
+        extractor = partial(TextExtractor, max_chars=TEXT_BUDGET)
+    else:
+        extractor = None
+    pages = (fetcher or get_fetcher()).fetch_all(missing, headers=validators, extractor=extractor)
+    for url, page in pages.items():
+        if page.status == 304:
+            texts[url] = page_cache.revalidate(url)
+            continue
+        if extractor is not None:
+            texts[url] = page.text
+        else:
+            with tracer.span("extract", chars=len(page.text)):
+                texts[url] = extract_text(make_soup(page.text))
+        if page.status == 200:
+            page_cache.put(url, texts[url], etag=page.headers.get("ETag"), last_modified=page.headers.get("Last-Modified"))
+            if LOCAL_INDEX:
+                with tracer.span("index") as index_span:
+                    added, removed = get_local_index().add(url, texts[url])
+                    index_span.set(chunks_added=added, chunks_removed=removed)
+    return {url: texts[url] for url in urls if texts.get(url) is not None}